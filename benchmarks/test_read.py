@@ -0,0 +1,66 @@
+"""Timings of discovery and of whole, partitioned and chunked reads
+
+Run with ``pytest benchmarks --benchmark-autosave``, and compare against an
+earlier run with ``--benchmark-compare``.
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from intake_odbc import ODBCPartitionedSource, ODBCSource  # noqa: E402
+from .util import (QUERY, ROWS, WIDTHS, measure,  # noqa: E402
+                   record_peak_memory, sqlite_db)
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+def test_discover(benchmark, sqlite_db, width):
+    kwargs = sqlite_db(ROWS[0], width)
+    benchmark(lambda: ODBCSource(None, QUERY, **kwargs).discover())
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+@pytest.mark.parametrize('rows', ROWS)
+def test_source_read(benchmark, sqlite_db, rows, width):
+    kwargs = sqlite_db(rows, width)
+    df = measure(benchmark,
+                 lambda: ODBCSource(None, QUERY, **kwargs).read(), rows)
+    assert len(df) == rows
+    record_peak_memory(benchmark, ODBCSource, kwargs, 'read')
+
+
+@pytest.mark.parametrize('npartitions', [1, 4, 16])
+@pytest.mark.parametrize('width', WIDTHS)
+@pytest.mark.parametrize('rows', ROWS)
+def test_partitioned_read(benchmark, sqlite_db, rows, width, npartitions):
+    kwargs = dict(sqlite_db(rows, width), index='id',
+                  npartitions=npartitions)
+    df = measure(benchmark,
+                 lambda: ODBCPartitionedSource(None, QUERY, **kwargs).read(),
+                 rows)
+    assert len(df) == rows
+    record_peak_memory(benchmark, ODBCPartitionedSource, kwargs, 'read')
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+def test_read_partition(benchmark, sqlite_db, width):
+    rows = ROWS[-1]
+    kwargs = dict(sqlite_db(rows, width), index='id', npartitions=16)
+    source = ODBCPartitionedSource(None, QUERY, **kwargs)
+    source.discover()
+    measure(benchmark, lambda: source.read_partition(0), rows // 16)
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+@pytest.mark.parametrize('width', WIDTHS)
+def test_read_chunked(benchmark, sqlite_db, width, prefetch):
+    rows = ROWS[-1]
+    kwargs = dict(sqlite_db(rows, width), index='id', npartitions=16,
+                  prefetch=prefetch)
+
+    def consume():
+        source = ODBCPartitionedSource(None, QUERY, **kwargs)
+        return sum(len(chunk) for chunk in source.read_chunked())
+
+    assert measure(benchmark, consume, rows) == rows
+    record_peak_memory(benchmark, ODBCPartitionedSource, kwargs,
+                       'read_chunked')
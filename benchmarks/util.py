@@ -0,0 +1,128 @@
+"""Fixtures and helpers for the benchmarks
+
+The data lives in SQLite files reached through the SQLite ODBC driver, so
+that the benchmarks need no DB server; the timings are therefore dominated
+by the driver and this package's fetch and conversion code.
+"""
+import multiprocessing
+import os
+import queue as queue_module
+import sqlite3
+
+import numpy as np
+import pytest
+
+here = os.path.dirname(__file__)
+
+QUERY = "SELECT * FROM bench"
+ROWS = [10000, 200000]
+WIDTHS = [4, 32]
+WORDS = ['fridge', 'toaster', 'kettle', 'micro', 'mixer', 'oven']
+#: Seconds to wait for the process measuring peak memory
+MEMORY_TIMEOUT = 600
+
+
+def make_table(path, rows, width):
+    """Write table ``bench`` with an integer key ``id`` and ``width`` more
+    columns, alternately floats and short strings"""
+    cols = ['c%i %s' % (i, 'REAL' if i % 2 else 'TEXT') for i in range(width)]
+    data = [np.random.rand(rows) if i % 2 else
+            np.random.choice(WORDS, size=rows) for i in range(width)]
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE bench (id INTEGER PRIMARY KEY, {})".format(
+        ', '.join(cols)))
+    db.executemany("INSERT INTO bench VALUES ({})".format(
+        ', '.join(['?'] * (width + 1))),
+        zip(range(rows), *[d.tolist() for d in data]))
+    db.commit()
+    db.close()
+
+
+@pytest.fixture(scope='session')
+def sqlite_db(tmp_path_factory):
+    """Function returning connection arguments for a table of the given
+    numbers of rows and columns; each table is made once per session
+
+    The DSN is defined by the ``.ini`` files in this directory, which are
+    pointed to by ``ODBCSYSINI`` while the fixture is in use.
+    """
+    turbodbc = pytest.importorskip('turbodbc')
+    made = {}
+    before = os.environ.get('ODBCSYSINI')
+    os.environ['ODBCSYSINI'] = here
+
+    def get(rows, width):
+        if (rows, width) not in made:
+            path = str(tmp_path_factory.mktemp('db') / 'bench.db')
+            make_table(path, rows, width)
+            kwargs = dict(dsn='SQLITE', database=path)
+            try:
+                turbodbc.connect(**kwargs).close()
+            except turbodbc.Error as e:
+                pytest.skip('SQLite ODBC driver not available: %s' % e)
+            made[(rows, width)] = kwargs
+        return made[(rows, width)]
+    try:
+        yield get
+    finally:
+        if before is None:
+            del os.environ['ODBCSYSINI']
+        else:
+            os.environ['ODBCSYSINI'] = before
+
+
+def measure(benchmark, func, rows):
+    """Benchmark ``func``, recording the rows per second in ``extra_info``"""
+    out = benchmark(func)
+    if benchmark.stats is not None:
+        mean = benchmark.stats.stats.mean
+        benchmark.extra_info['rows_per_sec'] = rows / mean
+    return out
+
+
+def record_peak_memory(benchmark, cls, kwargs, method, *args):
+    """Peak resident memory of ``cls(None, QUERY, **kwargs).method(*args)``
+
+    The call is made in a fresh process, so that memory retained by earlier
+    runs (e.g., by the Arrow allocator) does not hide the peak. An error in
+    that process, or its failing to report within ``MEMORY_TIMEOUT``
+    seconds, fails the benchmark.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_peak_rss,
+                       args=(queue, cls, kwargs, method, args))
+    proc.start()
+    try:
+        peak, error = queue.get(timeout=MEMORY_TIMEOUT)
+    except queue_module.Empty:
+        peak, error = None, 'no result (exit code {})'.format(proc.exitcode)
+    finally:
+        proc.join(timeout=MEMORY_TIMEOUT)
+        if proc.exitcode is None:
+            proc.kill()
+            proc.join()
+    if error is not None:
+        pytest.fail('Measuring peak memory failed: {}'.format(error))
+    benchmark.extra_info['peak_memory_mb'] = peak / 2**20
+    return peak
+
+
+def _peak_rss(queue, cls, kwargs, method, args):
+    import resource
+    peak, error = None, 'unknown error'
+    try:
+        source = cls(None, QUERY, **kwargs)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out = getattr(source, method)(*args)
+        if method == 'read_chunked':
+            for _ in out:
+                pass
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux
+        peak, error = (after - before) * 1024, None
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        queue.put((peak, error))
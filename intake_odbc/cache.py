@@ -0,0 +1,126 @@
+"""On-disk cache of query results, stored as Arrow IPC files"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .sizes import _parse_bytes
+
+
+class ResultCache(object):
+    """
+    Directory of query results, keyed by a hash of the query and connection
+
+    Each entry is the Arrow table fetched for one query, so that cached and
+    fresh results go through the same conversion to pandas. An entry's file
+    modification time records when it was written, and its access time when
+    it was last read, which drive expiry and eviction respectively.
+
+    Parameters
+    ----------
+    path: str
+        Directory in which to store entries; created if it does not exist
+    ttl: float or None
+        Entries older than this many seconds are treated as missing
+    max_size: int, str or None
+        Total size of the entries, in bytes or as a string like ``"10GB"``.
+        After each write, least recently used entries are removed until the
+        total is within this size.
+    """
+    suffix = '.arrow'
+
+    def __init__(self, path, ttl=None, max_size=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_size = None if max_size is None else _parse_bytes(max_size)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(**parts):
+        """Hash of the given JSON-serialisable values"""
+        text = json.dumps(parts, sort_keys=True, default=repr)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + self.suffix)
+
+    def get(self, key):
+        """Cached Arrow table for ``key``, or None if missing or expired"""
+        import pyarrow as pa
+        fn = self._file(key)
+        now = time.time()
+        try:
+            written = os.stat(fn).st_mtime
+            if self.ttl is not None and now - written > self.ttl:
+                os.remove(fn)
+                raise FileNotFoundError(fn)
+            with pa.memory_map(fn) as f:
+                table = pa.ipc.open_file(f).read_all()
+            os.utime(fn, (now, written))
+        except (OSError, pa.ArrowInvalid):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return table
+
+    def put(self, key, table):
+        """Store an Arrow table under ``key``"""
+        import pyarrow as pa
+        # batches fetched separately may each have their own dictionary of
+        # strings, but the IPC file format allows one per column
+        table = table.unify_dictionaries()
+        fn = self._file(key)
+        tmp = '{}.{}-{}.tmp'.format(fn, os.getpid(), threading.get_ident())
+        with pa.OSFile(tmp, 'wb') as f:
+            with pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, fn)
+        self._evict()
+
+    def _entries(self):
+        out = []
+        for name in os.listdir(self.path):
+            if name.endswith(self.suffix):
+                try:
+                    out.append((name, os.stat(os.path.join(self.path, name))))
+                except OSError:
+                    pass  # removed concurrently
+        return out
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+        entries = sorted(self._entries(), key=lambda e: e[1].st_atime)
+        total = sum(st.st_size for _, st in entries)
+        for name, st in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                continue
+            total -= st.st_size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries"""
+        for name, _ in self._entries():
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Hit/miss/eviction counts of this instance, and current contents"""
+        entries = self._entries()
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, entries=len(entries),
+                    size=sum(st.st_size for _, st in entries))
@@ -0,0 +1,51 @@
+"""Hooks called by the ODBC sources at each step of running a query"""
+
+
+class QueryHooks(object):
+    """
+    Receiver of calls at each step of the queries a source runs
+
+    Pass an instance (or a list of them) as the ``hooks`` argument of a
+    source to attach profilers, samplers or tracing. Subclass this and
+    override the methods of interest; any object with some of these methods
+    will also do.
+
+    Every method receives the source, and all but ``on_close`` the metrics
+    record of the query (see ``intake_odbc.metrics.QueryMetrics``), which
+    says what the query is for (``kind``, ``partition``, ``sql``) and is
+    filled in as it proceeds; it is the same object in every call for one
+    query. Hooks run in the thread running the query, which is a worker
+    thread when ``max_workers`` or ``prefetch`` are used.
+    """
+
+    def on_connect(self, source, record):
+        """A connection has been taken from the pool for the query
+
+        Small queries run during discovery (bounds, counts) share one
+        connection, and this is not called for them.
+        """
+
+    def on_execute_start(self, source, record):
+        """The query is about to be sent to the DB"""
+
+    def on_first_batch(self, source, record, data):
+        """The first data of the result has arrived
+
+        ``data`` is an Arrow table of the first batch of rows, as received
+        from turbodbc. This is not called for results found in the result
+        cache, nor for the bounds, count and quantile queries of discovery;
+        it is called for the discovery head query.
+        """
+
+    def on_fetch_complete(self, source, record, data):
+        """The result has been fetched, or found in the result cache
+
+        ``data`` is the result as fetched: an Arrow table, a row or a list
+        of rows for small queries, or None if it was streamed in batches.
+        """
+
+    def on_convert_complete(self, source, record, df):
+        """The result has been converted to the pandas dataframe ``df``"""
+
+    def on_close(self, source):
+        """The source has been closed"""
@@ -1,9 +1,306 @@
+import datetime
+import os
+import re
+import tempfile
+import time
+
 from intake.source import base
 import numpy as np
+import pandas as pd
 from . import __version__
+from .metrics import QueryMetrics, set_sql, timed
+from .pool import default_pool
+from .sizes import _parse_bytes
+
+
+class _ODBCMixin(object):
+    """Connection and result handling shared by the ODBC sources"""
+
+    def _init_metrics(self, odbc_kwargs):
+        self._metrics_callback = odbc_kwargs.pop('metrics_callback', None)
+        self.metrics = QueryMetrics(self._query_done)
+        hooks = odbc_kwargs.pop('hooks', None) or []
+        self._hooks = list(hooks) if isinstance(hooks, (list, tuple)) else [
+            hooks]
+
+    def _init_tracing(self, odbc_kwargs):
+        trace_dir = odbc_kwargs.pop('trace_dir', None)
+        trace_id = odbc_kwargs.pop('trace_id', None)
+        parent = odbc_kwargs.pop('trace_parent', None)
+        self.tracer = None
+        if trace_dir is not None:
+            from .tracing import JSONTracer
+            self.tracer = JSONTracer(trace_dir, trace_id, parent, dict(
+                source=type(self).__name__, sql=self._sql_expr))
+
+    def _trace_state(self):
+        """Arguments making unpickled copies continue this source's trace"""
+        if self.tracer is None:
+            return {}
+        return dict(trace_id=self.tracer.trace_id,
+                    trace_parent=self.tracer.span_id)
+
+    def _query_done(self, record):
+        if self.tracer is not None:
+            self.tracer.export_query(record)
+        if self._metrics_callback is not None:
+            self._metrics_callback(record)
+
+    def _hook(self, name, *args):
+        """Call method ``name`` of each hook object that has it"""
+        for hook in self._hooks:
+            method = getattr(hook, name, None)
+            if method is not None:
+                method(self, *args)
+
+    def _init_cache(self, odbc_kwargs):
+        cache_dir = odbc_kwargs.pop('cache_dir', None)
+        ttl = odbc_kwargs.pop('cache_ttl', None)
+        max_size = odbc_kwargs.pop('cache_max_size', None)
+        self.result_cache = None
+        if cache_dir is not None:
+            options = odbc_kwargs.get('turbodbc_options')
+            if options is not None and not isinstance(options, dict):
+                # the key must describe the options, and the repr of a
+                # turbodbc.Options object differs between instances
+                raise ValueError('cache_dir requires turbodbc_options to be '
+                                 'given as a dict')
+            from .cache import ResultCache
+            self.result_cache = ResultCache(cache_dir, ttl=ttl,
+                                            max_size=max_size)
+
+    def _init_filters(self, odbc_kwargs):
+        # the filters become a subquery wrapping the user's query, so every
+        # query built on self._expr must be executed with self._params
+        where, self._params = compile_filters(odbc_kwargs.pop('filters',
+                                                              None))
+        self._expr = filtered(self._sql_expr, where)
+
+    def _init_conversion(self, odbc_kwargs):
+        self._strings = odbc_kwargs.pop('strings', 'object')
+        if self._strings not in ('object', 'category', 'pyarrow'):
+            raise ValueError('strings must be "object", "category" or '
+                             '"pyarrow", not %r' % self._strings)
+        self._nullable_ints = odbc_kwargs.pop('nullable_ints', False)
+        self._self_destruct = odbc_kwargs.pop('self_destruct', False)
+        max_memory = odbc_kwargs.pop('max_memory', None)
+        self._max_memory = (None if max_memory is None
+                            else _parse_bytes(max_memory))
+        self._spill_dir = odbc_kwargs.pop('spill_dir', None)
+        # let turbodbc build dictionary arrays, rather than converting later
+        self._arrow_options = {
+            'strings_as_dictionary': self._strings == 'category'}
+
+    def _to_pandas(self, table):
+        """Convert a fetched Arrow table with the configured options"""
+        import pyarrow as pa
+        kwargs, types = {}, {}
+        if self._strings == 'category':
+            kwargs['strings_to_categorical'] = True
+        elif self._strings == 'pyarrow':
+            types[pa.string()] = types[pa.large_string()] = pd.StringDtype(
+                'pyarrow')
+        if self._nullable_ints:
+            for bits in (8, 16, 32, 64):
+                types[getattr(pa, 'int%i' % bits)()] = \
+                    pd.api.types.pandas_dtype('Int%i' % bits)
+                types[getattr(pa, 'uint%i' % bits)()] = \
+                    pd.api.types.pandas_dtype('UInt%i' % bits)
+        if types:
+            kwargs['types_mapper'] = types.get
+        if self._self_destruct:
+            # release each column's Arrow memory once converted; the table
+            # must not be used afterwards
+            kwargs.update(self_destruct=True, split_blocks=True)
+        return table.to_pandas(**kwargs)
+
+    def _convert(self, table, record, index=None):
+        """``_to_pandas``, and optionally ``set_index``, adding the time taken
+        and the dataframe's size to a query's metrics record"""
+        with timed(record, 'convert'):
+            df = self._to_pandas(table)
+        if index is not None:
+            with timed(record, 'set_index'):
+                df = df.set_index(index)
+        record['pandas_bytes'] = int(df.memory_usage(deep=False).sum())
+        self._hook('on_convert_complete', record, df)
+        return df
+
+    def _init_connect(self, odbc_kwargs):
+        self._odbc_kwargs = odbc_kwargs
+        self._buffer_options = None
+        given = odbc_kwargs.get('turbodbc_options')
+        if given is not None and not isinstance(given, dict):
+            self._connect_kwargs = odbc_kwargs
+            return
+        # until discovery tunes them, use the options most sources end up
+        # with, so that discovery draws on the same pooled connections
+        options = {'read_buffer_size': '{}MB'.format(BUFFER_BYTES // 2**20)}
+        if self._ms:
+            options['prefer_unicode'] = True
+        options.update(given or {})
+        self._connect_kwargs = dict(odbc_kwargs, turbodbc_options=options)
+
+    def _connection(self):
+        return default_pool.connection(self._uri, self._connect_kwargs)
+
+    def _sample(self):
+        """Fetch the discovery sample as Arrow, and tune the connection
+        options for the reads to follow"""
+        q = head(self._expr, self._head_rows, self._ms, self._columns)
+        table = self._fetch(q, self._params, cache=False, kind='head')
+        self._tune(table)
+        return table
+
+    def _tune(self, sample):
+        """Choose turbodbc options suited to the sampled columns
+
+        Options given by the user in a ``turbodbc_options`` dict take
+        precedence, and a ``turbodbc.Options`` object is used unchanged.
+        Only the buffer size is tuned, so the column types of the sample
+        hold for the reads too.
+        """
+        given = self._odbc_kwargs.get('turbodbc_options')
+        if given is not None and not isinstance(given, dict):
+            return
+        self._buffer_options = buffer_options(sample, self._ms)
+        self._buffer_options.update(given or {})
+        self._connect_kwargs = dict(self._odbc_kwargs,
+                                    turbodbc_options=self._buffer_options)
 
+    def _fetch(self, q, params=None, cache=True, kind='query', record=None):
+        """Execute ``q`` and return the whole result as an Arrow table
 
-class ODBCSource(base.DataSource):
+        If a result cache is configured, the table is looked up there first,
+        keyed by the query text, its parameters and connection parameters.
+        With ``cache=False``, the query is always executed and not stored.
+        The query's metrics go into ``record``, if given, or else a new
+        record of the given ``kind``.
+        """
+        if record is None:
+            with self.metrics.query(kind) as record:
+                return self._fetch(q, params, cache, record=record)
+        set_sql(record, q)
+        cache, key = self.result_cache if cache else None, None
+        if cache is not None:
+            key = self._cache_key(sql=q, params=params,
+                                  options=self._result_options())
+            table = cache.get(key)
+            if table is not None:
+                record.update(cached=True, rows=table.num_rows,
+                              arrow_bytes=table.nbytes)
+                self._hook('on_fetch_complete', record, table)
+                return table
+        start = time.perf_counter()
+        with self._connection() as conn:
+            record['phases']['connect'] = time.perf_counter() - start
+            self._hook('on_connect', record)
+            cursor = conn.cursor()
+            self._hook('on_execute_start', record)
+            with timed(record, 'execute'):
+                cursor.execute(q, params or None)
+            with timed(record, 'fetch'):
+                # fetched in batches, so that hooks see the first one arrive
+                tables = self._first_batch(
+                    record, cursor.fetcharrowbatches(**self._arrow_options))
+                if self._max_memory is None:
+                    import pyarrow as pa
+                    table = pa.concat_tables(tables)
+                else:
+                    table, record['spilled'] = collect_spilling(
+                        tables, self._max_memory, self._spill_dir)
+        record.update(rows=table.num_rows, arrow_bytes=table.nbytes)
+        self._hook('on_fetch_complete', record, table)
+        if cache is not None:
+            cache.put(key, table)
+        return table
+
+    def _first_batch(self, record, tables):
+        """Pass through ``tables``, calling the ``on_first_batch`` hooks as
+        the first arrives"""
+        first = True
+        for table in tables:
+            if first:
+                self._hook('on_first_batch', record, table)
+                first = False
+            yield table
+
+    def _cache_key(self, **parts):
+        """Result-cache key of ``parts`` and the connection parameters
+
+        turbodbc options are left to the caller: pickled copies of a source
+        are given the options chosen at discovery as an argument, and these
+        must not make their keys differ from the original's.
+        """
+        odbc_kwargs = {k: v for k, v in self._odbc_kwargs.items()
+                       if k != 'turbodbc_options'}
+        return self.result_cache.key(uri=self._uri, odbc_kwargs=odbc_kwargs,
+                                     arrow=self._arrow_options, **parts)
+
+    def _result_options(self):
+        """The turbodbc options in use which can change a query's result"""
+        options = self._connect_kwargs.get('turbodbc_options')
+        if not isinstance(options, dict):
+            return options
+        # the buffer size does not affect the result, unlike other options
+        return {k: v for k, v in options.items() if k != 'read_buffer_size'}
+
+    def _query(self, cursor, kind, q, fetch='fetchone'):
+        """Execute a query on an open cursor, recording its metrics, and
+        return the result of the cursor's ``fetch`` method"""
+        with self.metrics.query(kind, q) as record:
+            self._hook('on_execute_start', record)
+            with timed(record, 'execute'):
+                cursor.execute(q, self._params or None)
+            with timed(record, 'fetch'):
+                out = getattr(cursor, fetch)()
+            if fetch == 'fetchallarrow':
+                record.update(rows=out.num_rows, arrow_bytes=out.nbytes)
+            else:
+                record['rows'] = len(out) if fetch == 'fetchall' else 1
+            self._hook('on_fetch_complete', record, out)
+        return out
+
+    def _stream(self, q, params, rows=None, nbytes=None, kind='batches',
+                partition=None):
+        """Execute ``q`` and yield its result as Arrow tables of about
+        ``rows`` rows or ``nbytes`` bytes, fetched as they are consumed
+
+        An empty result gives one empty table, so that its schema is known.
+        """
+        with self.metrics.query(kind, q, partition) as record:
+            record.update(rows=0, arrow_bytes=0)
+            start = time.perf_counter()
+            with self._connection() as conn:
+                record['phases']['connect'] = time.perf_counter() - start
+                self._hook('on_connect', record)
+                cursor = conn.cursor()
+                self._hook('on_execute_start', record)
+                with timed(record, 'execute'):
+                    cursor.execute(q, params or None)
+                schemas = []
+                tables = _rebatch(_note_schema(
+                    cursor.fetcharrowbatches(**self._arrow_options), schemas),
+                    rows, nbytes)
+                first = True
+                while True:
+                    # time spent by the consumer is not counted
+                    with timed(record, 'fetch'):
+                        table = next(tables, None)
+                    if table is None:
+                        break
+                    if first:
+                        self._hook('on_first_batch', record, table)
+                        first = False
+                    record['rows'] += table.num_rows
+                    record['arrow_bytes'] += table.nbytes
+                    yield table
+                if first and schemas:
+                    yield schemas[0].empty_table()
+            self._hook('on_fetch_complete', record, None)
+
+
+class ODBCSource(_ODBCMixin, base.DataSource):
     """
     One-shot ODBC to dataframe reader
 
@@ -20,10 +317,69 @@ class ODBCSource(base.DataSource):
 
         head_rows: int (10)
             Number of rows that are read from the start of the data to infer
-            data types upon discovery
+            data types upon discovery. If zero, discovery only asks for the
+            result's columns and types, without the DB producing any rows
         mssql: bool (False)
             Whether to use MS SQL Server syntax - depends on the backend target
             of the connection
+        batch_size: int or str (None)
+            Target size of the dataframes produced by ``read_chunked()``;
+            an integer is a number of rows, a string such as ``"64MB"`` is a
+            number of bytes. If not given, the batches are those produced by
+            turbodbc's read buffer.
+        columns: list of str (None)
+            Only fetch these columns of the query result, rather than all
+        filters: list (None)
+            Only fetch rows matching these ``(column, op, value)`` predicates,
+            where op is one of ``=, !=, <, <=, >, >=, in, not in``; a list of
+            lists of predicates means any of the inner lists must match. The
+            values are sent to the DB as bound parameters
+        strings: "object", "category" or "pyarrow" ("object")
+            pandas type for string columns: python objects, categoricals
+            (cheap for low-cardinality text) or ``string[pyarrow]``
+        nullable_ints: bool (False)
+            Use pandas' nullable integer types, so that integer columns with
+            NULLs are not converted to float
+        self_destruct: bool (False)
+            Release the Arrow memory of each column while converting to
+            pandas, reducing peak memory
+        max_memory: int or str (None)
+            Most memory, in bytes or like ``"8GB"``, that the fetched Arrow
+            data of one query may take; beyond this, the result is written
+            to a file in ``spill_dir`` and memory-mapped, so that the OS
+            pages it in as needed
+        spill_dir: str (None)
+            Directory for results exceeding ``max_memory``; by default, the
+            system's temporary directory
+        turbodbc_options: dict or turbodbc.Options (None)
+            Connection options. By default, the read buffer size and other
+            options are chosen from the columns found at discovery (reported
+            as ``metadata['turbodbc_options']``); values given in a dict,
+            such as ``read_buffer_size`` (rows, or e.g. ``"20MB"``), take
+            precedence, and an ``Options`` object is used as is
+        cache_dir: str (None)
+            If given, query results are cached as Arrow files in this
+            directory, keyed by the query and connection parameters; see
+            ``result_cache.stats()`` for hit/miss counts
+        cache_ttl: float (None)
+            Age in seconds after which cached results are re-fetched
+        cache_max_size: int or str (None)
+            Total size of the cache directory, in bytes or like ``"10GB"``;
+            the least recently used results are removed beyond this
+        metrics_callback: callable (None)
+            Called with the metrics record of each query as it finishes;
+            all records are kept in ``metrics.records`` (see
+            ``intake_odbc.metrics.QueryMetrics``)
+        hooks: object or list of objects (None)
+            Called at each step of every query, e.g., for profiling; see
+            ``intake_odbc.hooks.QueryHooks`` for the methods
+        trace_dir: str (None)
+            If given, write a trace span for each query to JSON files in this
+            directory, including from copies of the source on dask workers;
+            see ``intake_odbc.tracing.JSONTracer``
+        trace_id: str (None)
+            Identifier of the trace the spans belong to; a new one is made
+            if not given
     """
     name = 'odbc'
     version = __version__
@@ -36,63 +392,508 @@ class ODBCSource(base.DataSource):
         self._sql_expr = sql_expr
         self._head_rows = odbc_kwargs.pop('head_rows', 10)
         self._ms = odbc_kwargs.pop('mssql', False)
-        self._odbc_kwargs = odbc_kwargs
+        self._batch_size = odbc_kwargs.pop('batch_size', None)
+        self._columns = odbc_kwargs.pop('columns', None)
+        self._init_metrics(odbc_kwargs)
+        self._init_tracing(odbc_kwargs)
+        self._init_cache(odbc_kwargs)
+        self._init_filters(odbc_kwargs)
+        self._init_conversion(odbc_kwargs)
+        self._init_connect(odbc_kwargs)
         self._dataframe = None
-        self._connection = None
-        self._cursor = None
 
         super(ODBCSource, self).__init__(metadata=metadata)
 
     def _get_schema(self):
-        from turbodbc import connect
         if self._dataframe is None:
-            self._connection = connect(connection_string=self._uri,
-                                       **self._odbc_kwargs)
-            cursor = self._connection.cursor()
-            self._cursor = cursor
-            if self._ms:
-                q = ms_limit(self._sql_expr, self._head_rows)
-            else:
-                q = limit(self._sql_expr, self._head_rows)
-            cursor.execute(q)
-            head = cursor.fetchallarrow().to_pandas()
-            dtype = head[:0]
-            shape = (None, head.shape[1])
+            sample = self._to_pandas(self._sample())
+            dtype = sample[:0]
+            shape = (None, sample.shape[1])
         else:
             dtype = {k: str(v) for k, v
                      in self._dataframe.dtypes.to_dict().items()}
             shape = self._dataframe.shape
+        extra = {}
+        if self._buffer_options is not None:
+            extra['turbodbc_options'] = self._buffer_options
         return base.Schema(datashape=None,
                            dtype=dtype,
                            shape=shape,
                            npartitions=1,
-                           extra_metadata={})
+                           extra_metadata=extra)
 
     def _get_partition(self, _):
-        self._get_schema()
         if self._dataframe is None:
-            self._cursor.execute(self._sql_expr)
-            self._dataframe = self._cursor.fetchallarrow().to_pandas()
+            self._load_metadata()
+            q = select(self._expr, self._columns)
+            with self.metrics.query('read') as record:
+                table = self._fetch(q, self._params, record=record)
+                self._dataframe = self._convert(table, record)
             self._schema = None
         return self._dataframe
 
+    def read_chunked(self):
+        """Stream the query result as a sequence of dataframes
+
+        Rows are fetched from the server in Arrow batches and regrouped to
+        ``batch_size``, so that only one batch is held in memory at a time.
+        """
+        import pyarrow as pa
+        self._load_metadata()
+        if self._dataframe is not None:
+            yield self._dataframe
+            return
+        empty = True
+        for batch in self.to_arrow_batches():
+            empty = False
+            yield self._to_pandas(pa.Table.from_batches([batch]))
+        if empty:
+            yield self.dtype
+
+    def read_arrow(self):
+        """Load the entire result as a ``pyarrow.Table``
+
+        This avoids the conversion to pandas, for consumers of Arrow data.
+        """
+        self._load_metadata()
+        return self._fetch(select(self._expr, self._columns), self._params,
+                           kind='read')
+
+    def to_arrow_batches(self):
+        """Stream the query result as ``pyarrow.RecordBatch`` objects
+
+        The batches are of about ``batch_size``, as for ``read_chunked()``.
+        """
+        self._load_metadata()
+        rows, nbytes = _parse_batch_size(self._batch_size)
+        for table in self._stream(select(self._expr, self._columns),
+                                  self._params, rows, nbytes):
+            for batch in table.combine_chunks().to_batches():
+                yield batch
+
+    def to_parquet(self, path, row_group_size=None, **kwargs):
+        """Write the query result to a Parquet file, without converting to
+        pandas
+
+        Arrow batches are written as they arrive from the server, so the
+        whole result is never held in memory. ``row_group_size`` is the
+        size of the row groups, as rows or like ``"64MB"``; by default, the
+        batches of ``batch_size`` or of turbodbc's read buffer are used.
+        Further arguments go to ``pyarrow.parquet.ParquetWriter``, e.g.,
+        ``compression``. Returns ``path``.
+        """
+        self._load_metadata()
+        rows, nbytes = _parse_batch_size(row_group_size or self._batch_size)
+        write_parquet(self._stream(select(self._expr, self._columns),
+                                   self._params, rows, nbytes, 'parquet'),
+                      path, **kwargs)
+        return path
+
     def _close(self):
         self._dataframe = None
-        self._connection = None
-        self._cursor = None
+        self._hook('on_close')
+
+    def __getstate__(self):
+        state = super(ODBCSource, self).__getstate__()
+        state['kwargs'].update(self._trace_state())
+        return state
+
+
+class _PartitionReader(object):
+    """Function reading one partition of a source as a sorted dataframe
+
+    It takes a ``columns=`` argument, so that dask can push a selection of
+    columns down into the partition queries; older versions of dask use the
+    ``DataFrameIOFunction`` protocol (``columns``/``project_columns``)
+    instead.
+    """
+
+    def __init__(self, source, columns=None):
+        self.source = source
+        self._columns = columns
+
+    @property
+    def columns(self):
+        return self._columns
+
+    def project_columns(self, columns):
+        return _PartitionReader(self.source, list(columns))
+
+    def __call__(self, i, columns=None):
+        if columns is None:
+            columns = self._columns
+        df = self.source._get_partition(i, columns)
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        return df
 
 
-def ms_limit(q, lim):
+def select_list(columns=None):
+    """Columns of the subquery ``sq`` to select, all of them by default"""
+    if not columns:
+        return 'sq.*'
+    for col in columns:
+        # names are pasted into the SQL, so allow plain identifiers only
+        if not isinstance(col, str) or not re.match(r'^\w+$', col):
+            raise ValueError('Invalid column name: %r' % (col, ))
+    return ', '.join('sq.' + c for c in columns)
+
+
+def select(q, columns=None):
+    """Project ``q`` onto the given columns, if any"""
+    if not columns:
+        return q
+    return "SELECT {} FROM ({}) sq".format(select_list(columns), q)
+
+
+_FILTER_OPS = {'=': '=', '==': '=', '!=': '<>', '<>': '<>', '<': '<',
+               '<=': '<=', '>': '>', '>=': '>=', 'in': 'IN',
+               'not in': 'NOT IN'}
+
+
+def compile_filters(filters):
+    """Condition and parameters implementing pyarrow/dask-style filters
+
+    ``filters`` is a list of ``(column, op, value)`` predicates which must all
+    hold, or a list of such lists, any of which must hold. Values are not
+    included in the SQL text, but returned as parameters to bind, in order.
+
+    Returns
+    -------
+    (condition or None, list of parameters)
+    """
+    if not filters:
+        return None, []
+    if isinstance(filters[0][0], str):
+        filters = [filters]
+    ors, params = [], []
+    for conjunction in filters:
+        ands = []
+        for col, op, value in conjunction:
+            if not re.match(r'^\w+$', col):
+                raise ValueError('Invalid column name in filter: %r' % col)
+            sql_op = _FILTER_OPS.get(op.lower() if isinstance(op, str)
+                                     else op)
+            if sql_op is None:
+                raise ValueError('Unknown filter operator: %r' % op)
+            if sql_op in ('IN', 'NOT IN'):
+                values = [_plain(v) for v in value]
+                if not values:
+                    ands.append('1=0' if sql_op == 'IN' else '1=1')
+                    continue
+                ands.append('sq.{} {} ({})'.format(
+                    col, sql_op, ', '.join('?' * len(values))))
+                params.extend(values)
+            else:
+                ands.append('sq.{} {} ?'.format(col, sql_op))
+                params.append(_plain(value))
+        ors.append('(' + ' AND '.join(ands) + ')')
+    return ' OR '.join(ors), params
+
+
+def filtered(q, where=None):
+    """Restrict ``q`` to rows matching the condition ``where``, if any"""
+    if not where:
+        return q
+    return "SELECT sq.* FROM ({}) sq WHERE {}".format(q, where)
+
+
+def ms_limit(q, lim, columns=None):
     """MS SQL Server implementation of 'limit'"""
-    return "SELECT TOP {} sq.* FROM ({}) sq".format(lim, q)
+    return "SELECT TOP {} {} FROM ({}) sq".format(lim, select_list(columns),
+                                                  q)
 
 
-def limit(q, lim):
+def limit(q, lim, columns=None):
     """Non-MS SQL Server implementation of 'limit'"""
-    return "SELECT sq.* FROM ({}) sq LIMIT {}".format(q, lim)
+    return "SELECT {} FROM ({}) sq LIMIT {}".format(select_list(columns), q,
+                                                    lim)
+
+
+def empty(q, columns=None):
+    """Query with the columns of ``q`` but no rows, which the DB can answer
+    without evaluating ``q``"""
+    return "SELECT {} FROM ({}) sq WHERE 1=0".format(select_list(columns), q)
+
+
+def head(q, lim, mssql=False, columns=None):
+    """Query for the first ``lim`` rows of ``q``, or for none if zero"""
+    if not lim:
+        return empty(q, columns)
+    if mssql:
+        return ms_limit(q, lim, columns)
+    return limit(q, lim, columns)
+
+
+def ntile_bounds(q, index, n):
+    """Query for the lowest and highest index value in each of ``n`` tiles
+
+    Each tile holds an equal share (within one row) of the non-null rows.
+    """
+    return ("SELECT MIN(t.ind) AS mi, MAX(t.ind) AS ma FROM "
+            "(SELECT sq.{ind} AS ind, NTILE({n}) OVER (ORDER BY sq.{ind}) "
+            "AS tile FROM ({q}) sq WHERE sq.{ind} IS NOT NULL) t "
+            "GROUP BY t.tile ORDER BY t.tile").format(q=q, ind=index, n=n)
+
+
+def estimate_row_width(table):
+    """Average bytes per row of an Arrow table, or an estimate from its
+    column types if it has no rows"""
+    if table.num_rows:
+        return table.nbytes / table.num_rows
+    width = 0
+    for field in table.schema:
+        try:
+            width += max(field.type.bit_width // 8, 1)
+        except ValueError:
+            width += 32  # variable width, e.g., text
+    return width or 1
+
+
+#: Size of the turbodbc read buffer aimed for by ``buffer_options``
+BUFFER_BYTES = 32 * 2**20
+#: Bounds on the number of rows in the turbodbc read buffer
+BUFFER_ROWS = (1000, 1000000)
+
+
+def buffer_options(table, mssql=False):
+    """turbodbc options suited to the columns of a sampled result
+
+    The read buffer is sized to hold about ``BUFFER_BYTES`` of rows as wide
+    as the sampled ones, within ``BUFFER_ROWS``. The size is given in
+    megabytes, since turbodbc allocates text buffers by declared rather than
+    actual width, and rounded to a power of two, since the options are part
+    of the key of pooled connections. MS SQL Server is asked for unicode
+    strings.
+    """
+    import pyarrow as pa
+    width = 0
+    for col in table.columns:
+        typ = col.type
+        if pa.types.is_dictionary(typ):
+            typ = typ.value_type
+        if pa.types.is_string(typ) or pa.types.is_large_string(typ) or \
+                pa.types.is_binary(typ):
+            values = [v for v in col.to_pylist() if v is not None]
+            longest = max([len(v) for v in values] or [32])
+            width += longest * (2 if mssql else 1) + 1
+        else:
+            try:
+                width += max(typ.bit_width // 8, 1)
+            except ValueError:
+                width += 8
+    rows = int(min(max(BUFFER_BYTES // max(width, 1), BUFFER_ROWS[0]),
+                   BUFFER_ROWS[1]))
+    size = 2 ** int(round(np.log2(max(rows * width / 2**20, 1))))
+    options = {'read_buffer_size': '{}MB'.format(size)}
+    if mssql:
+        options['prefer_unicode'] = True
+    return options
+
+
+def after(value):
+    """A value just above ``value``, as an exclusive upper bound
+
+    Timestamps are taken to whole seconds, so that the bound is also a
+    valid literal for DB types with no fractional seconds.
+    """
+    if isinstance(value, (datetime.datetime, np.datetime64)):
+        return (pd.Timestamp(value).floor('s') +
+                pd.Timedelta(seconds=1)).to_pydatetime()
+    if isinstance(value, datetime.date):
+        return value + datetime.timedelta(days=1)
+    if isinstance(value, (int, np.integer)):
+        return value + 1
+    if isinstance(value, (float, np.floating)):
+        return float(np.nextafter(value, np.inf))
+    return value + 0.001
+
+
+def linspace(lo, hi, n):
+    """``n + 1`` equally spaced boundaries from ``lo`` to ``hi``
+
+    Works for dates and timestamps as well as numbers; timestamps are
+    rounded down to whole seconds.
+    """
+    if isinstance(lo, (datetime.date, np.datetime64)):
+        lo_ts, hi_ts = pd.Timestamp(lo), pd.Timestamp(hi)
+        values = pd.to_datetime(np.linspace(lo_ts.value, hi_ts.value, n + 1)
+                                .astype('int64'))
+        if not isinstance(lo, (datetime.datetime, np.datetime64)):
+            return [v.date() for v in values.floor('D')]
+        return [v.to_pydatetime() for v in values.floor('s')]
+    return np.linspace(lo, hi, n + 1)
+
+
+def calendar_divisions(lo, hi, freq):
+    """Boundaries of the calendar periods of ``freq`` covering [lo, hi)"""
+    offset = pd.tseries.frequencies.to_offset(freq)
+    start = pd.Timestamp(lo)
+    try:
+        start = start.floor(offset)
+    except ValueError:
+        # non-fixed frequency, such as month start
+        start = offset.rollback(start.normalize())
+    values = list(pd.date_range(start, pd.Timestamp(hi), freq=offset))
+    if values[-1] < pd.Timestamp(hi):
+        values.append(values[-1] + offset)
+    if not isinstance(lo, (datetime.datetime, np.datetime64)):
+        return [v.date() for v in values]
+    return [v.to_pydatetime() for v in values]
+
+
+def sql_param(value):
+    """Python object for a boundary value that turbodbc can bind as a query
+    parameter"""
+    if isinstance(value, (np.datetime64, pd.Timestamp)):
+        return pd.Timestamp(value).to_pydatetime()
+    return _plain(value)
+
+
+def collect_spilling(tables, max_memory, directory=None):
+    """Concatenate Arrow tables, or, if they come to more than
+    ``max_memory`` bytes, write them to a file and memory-map it
+
+    Once the budget is exceeded, the tables held so far and all later ones
+    are written to an Arrow IPC stream file in ``directory``, one at a time,
+    and the result is read back from the memory-mapped file without
+    copying. The file is removed once mapped, where the OS allows it, and
+    its space is freed when the table is released. Returns the table and
+    whether it was spilled.
+    """
+    import pyarrow as pa
+    tables = iter(tables)
+    held, size = [], 0
+    for table in tables:
+        held.append(table)
+        size += table.nbytes
+        if size > max_memory:
+            break
+    else:
+        return pa.concat_tables(held), False
+    schema = held[0].schema
+    fd, fn = tempfile.mkstemp(suffix='.arrow', dir=directory)
+    os.close(fd)
+    try:
+        with pa.OSFile(fn, 'wb') as f:
+            # the stream format allows each batch its own string dictionary
+            with pa.ipc.new_stream(f, schema) as writer:
+                while held:
+                    writer.write_table(held.pop(0))
+                for table in tables:
+                    writer.write_table(table)
+        with pa.memory_map(fn) as f:
+            table = pa.ipc.open_stream(f).read_all()
+    finally:
+        try:
+            os.remove(fn)
+        except OSError:
+            pass
+    return table, True
+
+
+def _note_schema(tables, schemas):
+    """Pass through ``tables``, appending the first one's schema to
+    ``schemas``"""
+    for table in tables:
+        if not schemas:
+            schemas.append(table.schema)
+        yield table
+
+
+def write_parquet(tables, path, **kwargs):
+    """Write a stream of Arrow tables to one Parquet file, one or more row
+    groups per table"""
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for table in tables:
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, **kwargs)
+            writer.write_table(table, row_group_size=max(table.num_rows, 1))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _concat(parts):
+    """Concatenate dataframes, keeping categorical columns categorical even
+    if the parts have different categories"""
+    cats = [c for c, t in parts[0].dtypes.items()
+            if isinstance(t, pd.CategoricalDtype)] if parts else []
+    if cats:
+        from pandas.api.types import union_categoricals
+        parts = [p.copy(deep=False) for p in parts]
+        for c in cats:
+            categories = union_categoricals([p[c] for p in parts],
+                                            ignore_order=True).categories
+            for p in parts:
+                p[c] = p[c].cat.set_categories(categories)
+    return pd.concat(parts)
+
+
+def _plain(value):
+    """Convert numpy scalars to the equivalent python object"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+#: Default hash expressions for ``partitioning="hash"``; ``{col}`` is replaced
+#: by the index column, and the result must be an integer
+HASH = "hashtext(CAST({col} AS TEXT))"  # PostgreSQL
+MSSQL_HASH = "CHECKSUM({col})"
+
+
+def hash_condition(col, n, i, expr=HASH):
+    """Condition selecting the rows whose hash of ``col`` falls in bucket
+    ``i`` of ``n``
+
+    ABS is taken after the modulo, since ABS of the most negative integer
+    overflows on some backends.
+    """
+    return "ABS(({h}) % {n}) = {i}".format(h=expr.format(col=col), n=n, i=i)
+
+
+def _parse_batch_size(size):
+    """Interpret ``batch_size`` as (rows, bytes), at most one being set"""
+    if size is None:
+        return None, None
+    if isinstance(size, str):
+        return None, _parse_bytes(size)
+    return int(size), None
+
+
+def _rebatch(tables, rows=None, nbytes=None):
+    """Regroup a stream of Arrow tables into tables of bounded size
+
+    If neither ``rows`` nor ``nbytes`` is given, non-empty input tables are
+    passed through unchanged.
+    """
+    import pyarrow as pa
+    pending, nrows, size = [], 0, 0
+    for table in tables:
+        if rows is None and nbytes is None:
+            if table.num_rows:
+                yield table
+            continue
+        while table.num_rows:
+            row_bytes = table.nbytes / table.num_rows
+            if rows is not None:
+                take = rows - nrows
+            else:
+                take = max(1, int((nbytes - size) / max(row_bytes, 1)))
+            piece, table = table.slice(0, take), table.slice(take)
+            pending.append(piece)
+            nrows += piece.num_rows
+            size += piece.num_rows * row_bytes
+            if ((rows is not None and nrows >= rows) or
+                    (nbytes is not None and size >= nbytes)):
+                yield pa.concat_tables(pending)
+                pending, nrows, size = [], 0, 0
+    if pending:
+        yield pa.concat_tables(pending)
 
 
-class ODBCPartitionedSource(base.DataSource):
+class ODBCPartitionedSource(_ODBCMixin, base.DataSource):
     """
     ODBC partitioned reader
 
@@ -112,19 +913,116 @@ class ODBCPartitionedSource(base.DataSource):
 
         head_rows: int (10)
             Number of rows that are read from the start of the data to infer
-            data types upon discovery
+            data types upon discovery. If zero, discovery only asks for the
+            result's columns and types, without the DB producing any rows
         mssql: bool (False)
             Whether to use MS SQL Server syntax - depends on the backend target
             of the connection
         index: str
             Column to use for partitioning
+        columns: list of str (None)
+            Only fetch these columns of the query result (and the index),
+            rather than all
+        filters: list (None)
+            Only fetch rows matching these ``(column, op, value)`` predicates,
+            where op is one of ``=, !=, <, <=, >, >=, in, not in``; a list of
+            lists of predicates means any of the inner lists must match. The
+            values are sent to the DB as bound parameters
+        strings: "object", "category" or "pyarrow" ("object")
+            pandas type for string columns: python objects, categoricals
+            (cheap for low-cardinality text) or ``string[pyarrow]``
+        nullable_ints: bool (False)
+            Use pandas' nullable integer types, so that integer columns with
+            NULLs are not converted to float
+        self_destruct: bool (False)
+            Release the Arrow memory of each column while converting to
+            pandas, reducing peak memory
+        max_memory: int or str (None)
+            Most memory, in bytes or like ``"8GB"``, that the fetched Arrow
+            data of one query may take; beyond this, the result is written
+            to a file in ``spill_dir`` and memory-mapped, so that the OS
+            pages it in as needed
+        spill_dir: str (None)
+            Directory for results exceeding ``max_memory``; by default, the
+            system's temporary directory
+        turbodbc_options: dict or turbodbc.Options (None)
+            Connection options. By default, the read buffer size and other
+            options are chosen from the columns found at discovery (reported
+            as ``metadata['turbodbc_options']``); values given in a dict,
+            such as ``read_buffer_size`` (rows, or e.g. ``"20MB"``), take
+            precedence, and an ``Options`` object is used as is
         max, min: str
-            Range of values in index to consider (will query DB if not given)
+            Range of values in index to consider (will query DB if not given);
+            max is exclusive. The index may be numeric, or a date or timestamp
         npartitions: int
             Number of partitions to assume
-        divisions: list of values
+        partition_size: int or str (None)
+            Instead of ``npartitions``, choose the number of partitions to
+            give each about this many bytes (e.g., ``"256MB"``), from the
+            row count and the average width of the rows sampled at discovery
+        rows_per_partition: int (None)
+            Instead of ``npartitions``, choose the number of partitions to
+            give each about this many rows
+        partition_freq: str (None)
+            For a date or timestamp index, make one partition per calendar
+            period of this pandas frequency, e.g., ``"1D"`` or ``"MS"``,
+            instead of ``npartitions`` equal ranges
+        divisions: list of values or "quantile"
             If given, use these as partition boundaries - and therefore ignore
-            max/min and npartitions
+            max/min and npartitions. With ``"quantile"``, ``npartitions``
+            boundaries are found in the DB such that each partition holds
+            about the same number of rows, which suits skewed index columns
+        partitioning: "range" or "hash" ("range")
+            With ``"hash"``, rows are assigned to ``npartitions`` partitions
+            by a hash of the index modulo ``npartitions``, which gives
+            balanced partitions for keys such as GUIDs or strings, and needs
+            no bounds query
+        hash_expr: str
+            Integer hash expression of ``{col}`` to use for hash partitioning;
+            by default ``CHECKSUM({col})`` for MS SQL Server and
+            ``hashtext(CAST({col} AS TEXT))`` (PostgreSQL) otherwise. For
+            MySQL, for example, ``CRC32({col})`` would do
+        max_workers: int (None)
+            If greater than one, ``read()`` fetches this many partitions
+            concurrently, each on its own connection
+        prefetch: int (0)
+            Number of partitions that ``read_chunked()`` and
+            ``to_arrow_batches()`` fetch ahead in background threads, each
+            on its own connection, while the caller works on the current one.
+            At most this many partitions beyond the current one are held in
+            memory
+        sort_index: bool (False)
+            Have the DB order the rows of each partition by the index
+            (``ORDER BY``). Partitions given to dask by ``to_dask()`` must be
+            sorted, and are otherwise sorted after loading
+        cache_dir: str (None)
+            If given, query results are cached as Arrow files in this
+            directory, keyed by the query and connection parameters; see
+            ``result_cache.stats()`` for hit/miss counts
+        cache_ttl: float (None)
+            Age in seconds after which cached results are re-fetched
+        cache_max_size: int or str (None)
+            Total size of the cache directory, in bytes or like ``"10GB"``;
+            the least recently used results are removed beyond this
+        metrics_callback: callable (None)
+            Called with the metrics record of each query as it finishes;
+            all records are kept in ``metrics.records`` (see
+            ``intake_odbc.metrics.QueryMetrics``)
+        hooks: object or list of objects (None)
+            Called at each step of every query, e.g., for profiling; see
+            ``intake_odbc.hooks.QueryHooks`` for the methods
+        trace_dir: str (None)
+            If given, write a trace span for each query to JSON files in this
+            directory, including from copies of the source on dask workers;
+            see ``intake_odbc.tracing.JSONTracer``
+        trace_id: str (None)
+            Identifier of the trace the spans belong to; a new one is made
+            if not given
+        incremental: bool (False)
+            For tables which are only appended to: keep the result of
+            ``read()`` in ``cache_dir`` (which is required), and on later
+            reads fetch only the rows whose index is above the highest one
+            already held, returning them together with the stored rows
     """
     name = 'odbc'
     version = __version__
@@ -133,66 +1031,413 @@ class ODBCPartitionedSource(base.DataSource):
 
     def __init__(self, uri, sql_expr, metadata=None, **odbc_kwargs):
         odbc_kwargs = odbc_kwargs.copy()
+        self._init_kwargs = odbc_kwargs.copy()
         self._uri = uri
         self._sql_expr = sql_expr
         self._head_rows = odbc_kwargs.pop('head_rows', 10)
         self._ms = odbc_kwargs.pop('mssql', False)
         self._index = odbc_kwargs.pop('index')  # required
+        self._columns = odbc_kwargs.pop('columns', None)
+        if self._columns and self._index not in self._columns:
+            self._columns = list(self._columns) + [self._index]
         self._max = odbc_kwargs.pop('max', None)
         self._min = odbc_kwargs.pop('min', None)
         self._npartitions = odbc_kwargs.pop('npartitions', None)
         self._divisions = odbc_kwargs.pop('divisions', None)
-        self._odbc_kwargs = odbc_kwargs
-        self._connection = None
-        self._cursor = None
+        self._partition_freq = odbc_kwargs.pop('partition_freq', None)
+        self._max_workers = odbc_kwargs.pop('max_workers', None)
+        self._partitioning = odbc_kwargs.pop('partitioning', 'range')
+        if self._partitioning not in ('range', 'hash'):
+            raise ValueError('partitioning must be "range" or "hash", not %r'
+                             % self._partitioning)
+        self._hash_expr = odbc_kwargs.pop(
+            'hash_expr', MSSQL_HASH if self._ms else HASH)
+        self._partition_size = odbc_kwargs.pop('partition_size', None)
+        self._rows_per_partition = odbc_kwargs.pop('rows_per_partition', None)
+        self._sort_index = odbc_kwargs.pop('sort_index', False)
+        self._prefetch = odbc_kwargs.pop('prefetch', 0)
+        self._incremental = odbc_kwargs.pop('incremental', False)
+        self._count = None
+        sized = self._partition_size or self._rows_per_partition
+        if self._partitioning == 'hash' and not (self._npartitions or sized):
+            raise ValueError('Hash partitioning requires npartitions')
+        if isinstance(self._divisions, str) and not (self._npartitions or
+                                                     sized):
+            raise ValueError('Quantile divisions require npartitions')
+        self._init_metrics(odbc_kwargs)
+        self._init_tracing(odbc_kwargs)
+        self._init_cache(odbc_kwargs)
+        if self._incremental and self.result_cache is None:
+            raise ValueError('Incremental reads require cache_dir')
+        self._init_filters(odbc_kwargs)
+        self._init_conversion(odbc_kwargs)
+        self._init_connect(odbc_kwargs)
 
         super(ODBCPartitionedSource, self).__init__(metadata=metadata)
 
     def _get_schema(self):
-        from turbodbc import connect
-        self._connection = connect(connection_string=self._uri,
-                                   **self._odbc_kwargs)
-        cursor = self._connection.cursor()
-        self._cursor = cursor
-        if self._ms:
-            q = ms_limit(self._sql_expr, self._head_rows)
-        else:
-            q = limit(self._sql_expr, self._head_rows)
-        cursor.execute(q)
-        head = cursor.fetchallarrow().to_pandas().set_index(self._index)
-        dtype = head[:0]
-        shape = (None, head.shape[1])  # could have called COUNT()
-        nparts = self._npartitions or len(self._divisions)
+        table = self._sample()
+        # measured first, since conversion may release the table's memory
+        width = estimate_row_width(table)
+        sample = self._to_pandas(table).set_index(self._index)
+        dtype = sample[:0]
+        extra = {'partitioning': self._partitioning}
+        if self._buffer_options is not None:
+            extra['turbodbc_options'] = self._buffer_options
+        explicit = self._partitioning == 'range' and not isinstance(
+            self._divisions, (str, type(None)))
+        sized = self._npartitions is None and not explicit and bool(
+            self._partition_size or self._rows_per_partition)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            if sized:
+                self._npartitions = self._size_partitions(cursor, width)
+                extra.update(row_count=self._count, row_width=width)
+            if self._partitioning == 'range':
+                # resolve the boundaries once here, rather than in every
+                # process which reads a partition
+                divisions = [_plain(d) for d in self._get_divisions(cursor)]
+                extra['divisions'] = divisions
+        shape = (self._count, sample.shape[1])
+        if self._partitioning == 'hash':
+            # no bounds are needed, each partition is a hash bucket
+            return base.Schema(datashape=None,
+                               dtype=dtype,
+                               shape=shape,
+                               npartitions=self._npartitions,
+                               extra_metadata=extra)
+        if self._min is not None:
+            extra.update(min=_plain(self._min), max=_plain(self._max))
         return base.Schema(datashape=None,
                            dtype=dtype,
                            shape=shape,
-                           npartitions=nparts,
-                           extra_metadata={})
+                           npartitions=len(divisions) - 1,
+                           extra_metadata=extra)
+
+    def _size_partitions(self, cursor, width):
+        """Number of partitions giving each about ``partition_size`` bytes or
+        ``rows_per_partition`` rows, from the row count"""
+        if self._count is None:
+            if (self._partitioning == 'range' and self._divisions is None and
+                    self._max is None):
+                # the row count comes with the bounds
+                self._query_bounds(cursor, count=True)
+            else:
+                q = "SELECT COUNT(*) FROM ({exp}) sq".format(exp=self._expr)
+                self._count, = self._query(cursor, 'count', q)
+        if self._rows_per_partition:
+            rows = self._rows_per_partition
+        else:
+            rows = _parse_bytes(self._partition_size) / max(width, 1)
+        return max(1, int(np.ceil(self._count / rows)))
+
+    def _query_bounds(self, cursor, count=False):
+        """Fetch the index's range, and with ``count``, the row count too
+
+        The count is only asked for when needed, since unlike the bounds it
+        cannot be answered from an index and takes a full scan.
+        """
+        q = "SELECT MAX(sq.{ind}) as ma, MIN(sq.{ind}) as mi{n} " \
+            "FROM ({exp}) sq".format(ind=self._index, exp=self._expr,
+                                     n=', COUNT(*) as n' if count else '')
+        row = self._query(cursor, 'bounds', q)
+        self._max, self._min = row[0], row[1]
+        if count:
+            self._count = row[2]
+        self._max = after(self._max)
 
-    def _get_partition(self, i):
+    def _get_divisions(self, cursor):
+        if isinstance(self._divisions, str):
+            if self._divisions != 'quantile':
+                raise ValueError('Unknown divisions mode %r' % self._divisions)
+            self._divisions = self._quantile_divisions(cursor)
         if self._divisions is None:
             # compute divisions
             if self._max is None:
                 # get data boundaries from DB
-                q = "SELECT MAX(sq.{ind}) as ma, MIN(sq.{ind}) as mi " \
-                    "FROM ({exp}) sq".format(ind=self._index,
-                                             exp=self._sql_expr)
-                self._cursor.execute(q)
-                self._max, self._min = self._cursor.fetchone()
-                self._max += 0.001
-            self._divisions = np.linspace(self._min, self._max,
-                                          self._npartitions + 1)
+                self._query_bounds(cursor)
+            if isinstance(self._min, str):
+                # e.g., timestamps given as text in a catalog
+                self._min = pd.Timestamp(self._min).to_pydatetime()
+                self._max = pd.Timestamp(self._max).to_pydatetime()
+            if self._partition_freq:
+                self._divisions = calendar_divisions(
+                    self._min, self._max, self._partition_freq)
+            else:
+                self._divisions = linspace(self._min, self._max,
+                                           self._npartitions)
+        return self._divisions
+
+    def _quantile_divisions(self, cursor):
+        """Boundaries giving each partition about the same number of rows
 
+        The tiles are computed in the DB with the NTILE window function; for
+        backends without window functions, the index column alone is fetched
+        and split client-side.
+        """
+        from turbodbc import Error
+        n = self._npartitions
+        try:
+            tiles = self._query(cursor, 'quantile',
+                                ntile_bounds(self._expr, self._index, n),
+                                'fetchall')
+            lows = [lo for lo, _ in tiles]
+            top = max(hi for _, hi in tiles) if tiles else None
+        except Error:
+            q = "SELECT sq.{ind} FROM ({exp}) sq WHERE sq.{ind} IS NOT " \
+                "NULL".format(ind=self._index, exp=self._expr)
+            values = np.sort(self._query(cursor, 'quantile', q,
+                                         'fetchallarrow').column(0)
+                             .to_numpy(zero_copy_only=False))
+            lows = list(values[(np.arange(n) * len(values)) // n])
+            top = values[-1] if len(values) else None
+        if top is None:
+            return [0] * (n + 1)
+        # fewer distinct tiles than partitions leaves trailing partitions empty
+        top = after(top)
+        return lows + [top] * (n + 1 - len(lows))
+
+    def _get_partition(self, i, columns=None):
+        with self.metrics.query('partition', partition=i) as record:
+            table = self._get_arrow_partition(i, record, columns)
+            return self._convert(table, record, self._index)
+
+    def _get_arrow_partition(self, i, record=None, columns=None, cache=True):
+        if record is None:
+            with self.metrics.query('partition', partition=i) as record:
+                return self._get_arrow_partition(i, record, columns, cache)
+        q, params = self._partition_query(i, columns)
+        return self._fetch(q, params, cache=cache, record=record)
+
+    def _partition_query(self, i, columns=None):
+        """Query for partition ``i``, and its parameters
+
+        ``columns``, if given, replaces the source's column selection; the
+        index is always included.
+        """
+        if columns is None:
+            columns = self._columns
+        else:
+            columns = [c for c in columns if c != self._index] + [
+                self._index]
+        cond, params = self._partition_condition(i)
+        q = "SELECT {cols} FROM ({exp}) as sq WHERE {cond}".format(
+            cols=select_list(columns), exp=self._expr, cond=cond)
+        if self._sort_index:
+            q += " ORDER BY sq.{ind}".format(ind=self._index)
+        return q, list(self._params or []) + params
+
+    def _partition_condition(self, i):
+        """SQL condition selecting the rows of partition ``i`` from ``sq``,
+        and the parameters it binds
+
+        Range bounds are bound as parameters, so that the query text is the
+        same for every partition and the DB can reuse one plan for all.
+        """
+        if self._partitioning == 'hash':
+            return hash_condition('sq.' + self._index, self._npartitions, i,
+                                  self._hash_expr), []
+        if self._divisions is None or isinstance(self._divisions, str):
+            self._load_metadata()
         mi, ma = self._divisions[i:i+2]
-        q = "SELECT sq.* FROM ({exp}) as sq WHERE " \
-            "sq.{ind} >= {mi} AND sq.{ind} < {ma}".format(
-                exp=self._sql_expr, ind=self._index, mi=mi, ma=ma)
-        self._cursor.execute(q)
-        df = self._cursor.fetchallarrow().to_pandas()
-        return df.set_index(self._index)
+        return "sq.{ind} >= ? AND sq.{ind} < ?".format(ind=self._index), [
+            sql_param(mi), sql_param(ma)]
+
+    def _map_partitions(self, func):
+        """Apply ``func`` to each partition number, in parallel if
+        ``max_workers`` is set"""
+        self._load_metadata()
+        if self._max_workers and self._max_workers > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            # turbodbc releases the GIL while fetching, so threads overlap
+            with ThreadPoolExecutor(self._max_workers) as ex:
+                return list(ex.map(func, range(self.npartitions)))
+        return [func(i) for i in range(self.npartitions)]
+
+    def read(self):
+        """Load all partitions into a single dataframe
+
+        With ``max_workers`` set, the partition queries are issued
+        concurrently, each worker thread using its own pooled connection.
+        """
+        if self._incremental:
+            table = self._read_incremental()
+            return self._to_pandas(table).set_index(self._index)
+        return _concat(self._map_partitions(self._get_partition))
+
+    def read_arrow(self):
+        """Load all partitions into a single ``pyarrow.Table``
+
+        The index column is kept as an ordinary column, and no conversion to
+        pandas takes place.
+        """
+        import pyarrow as pa
+        if self._incremental:
+            return self._read_incremental()
+        return pa.concat_tables(self._map_partitions(
+            self._get_arrow_partition))
+
+    def _read_incremental(self):
+        """Stored rows plus those with an index above the high-water mark
+
+        The stored table is the previous result, and its highest index value
+        is the mark; without one, all partitions are read. Rows added with
+        an index at or below the mark are not seen.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        cache = self.result_cache
+        key = self._cache_key(incremental=self._index, sql=self._expr,
+                              params=self._params, columns=self._columns)
+        table = cache.get(key)
+        mark = None
+        if table is not None and table.num_rows:
+            mark = pc.max(table.column(self._index)).as_py()
+        if mark is None:
+            # only the whole table is stored, not each partition as well
+            table = pa.concat_tables(self._map_partitions(
+                lambda i: self._get_arrow_partition(i, cache=False)))
+        else:
+            if self._buffer_options is None:
+                # size the buffer from the stored rows, rather than running
+                # discovery's head and bounds queries
+                self._tune(table.slice(0, self._head_rows))
+            q = "SELECT {cols} FROM ({exp}) as sq WHERE sq.{ind} > ?".format(
+                cols=select_list(self._columns), exp=self._expr,
+                ind=self._index)
+            new = self._fetch(q, list(self._params or []) + [mark],
+                              cache=False, kind='delta')
+            if not new.num_rows:
+                return table
+            table = pa.concat_tables([table, new.cast(table.schema)])
+        # the IPC file format needs one dictionary per column
+        table = table.unify_dictionaries().combine_chunks()
+        cache.put(key, table)
+        return table
+
+    def _iter_partitions(self, func):
+        """Yield ``func`` of each partition number in order, computing up to
+        ``prefetch`` results ahead in background threads"""
+        self._load_metadata()
+        if not self._prefetch:
+            for i in range(self.npartitions):
+                yield func(i)
+            return
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        ex = ThreadPoolExecutor(self._prefetch)
+        pending = deque()
+        try:
+            for i in range(self.npartitions):
+                pending.append(ex.submit(func, i))
+                if len(pending) > self._prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # the consumer may stop early; do not start unwanted queries
+            for future in pending:
+                future.cancel()
+            ex.shutdown(wait=False)
+
+    def read_chunked(self):
+        """Iterate over the partitions as dataframes
+
+        With ``prefetch`` set, the following partitions are fetched while the
+        caller processes the current one.
+        """
+        return self._iter_partitions(self._get_partition)
+
+    def to_parquet(self, path, row_group_size=None, max_workers=None,
+                   **kwargs):
+        """Write each partition to a Parquet file in directory ``path``,
+        without converting to pandas
+
+        The files are named ``part.<i>.parquet``, and the index is an
+        ordinary column in them. Each partition's Arrow batches are written
+        as they arrive from the server, so no partition is held in memory
+        whole. ``max_workers`` partitions (by default, the source's
+        ``max_workers``, or else one per CPU) are written at a time, each
+        over its own connection. ``row_group_size`` is the size of the row
+        groups, as rows or like ``"64MB"``; by default, the batches of
+        turbodbc's read buffer are used. Further arguments go to
+        ``pyarrow.parquet.ParquetWriter``. Returns the paths of the files.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        self._load_metadata()
+        os.makedirs(path, exist_ok=True)
+        rows, nbytes = _parse_batch_size(row_group_size)
+
+        def write(i):
+            fn = os.path.join(path, 'part.%i.parquet' % i)
+            q, params = self._partition_query(i)
+            write_parquet(self._stream(q, params, rows, nbytes, 'parquet', i),
+                          fn, **kwargs)
+            return fn
+
+        workers = (max_workers or self._max_workers or
+                   min(self.npartitions, os.cpu_count() or 1))
+        with ThreadPoolExecutor(workers) as ex:
+            return list(ex.map(write, range(self.npartitions)))
+
+    def to_arrow_batches(self):
+        """Iterate over the partitions as ``pyarrow.RecordBatch`` objects"""
+        for table in self._iter_partitions(self._get_arrow_partition):
+            for batch in table.to_batches():
+                yield batch
+
+    def to_dask(self):
+        """Dask dataframe with one partition per partition query
+
+        For range partitioning, the dataframe's divisions are the partition
+        boundaries, so that dask knows which partitions hold which index
+        values, and joins on the index or ``.loc`` selections need not
+        shuffle. Hash partitions have unknown divisions.
+
+        Selecting columns of the result, e.g., ``source.to_dask()[['price']]``,
+        selects them in the partition queries too, so that the other
+        columns are not transferred.
+        """
+        import dask.dataframe as dd
+        self._load_metadata()
+        return dd.from_map(_PartitionReader(self), range(self.npartitions),
+                           meta=self.dtype, divisions=self._dask_divisions(),
+                           label='read-odbc')
+
+    def _dask_divisions(self):
+        """Partition boundaries in dask's form, or None if unknown"""
+        if self._partitioning == 'hash':
+            return None
+        divisions = [pd.Timestamp(d) if isinstance(d, datetime.date) else d
+                     for d in self._divisions]
+        # dask allows repeated boundaries (empty partitions) only at the end
+        if any(a >= b for a, b in zip(divisions[:-2], divisions[1:-1])):
+            return None
+        if divisions[-2] > divisions[-1]:
+            return None
+        return tuple(divisions)
+
+    def __getstate__(self):
+        # ship resolved boundaries, so that unpickled copies (e.g., on dask
+        # workers) do not each repeat the bounds query
+        kwargs = dict(self._init_kwargs, metadata=self.metadata)
+        if self._divisions is not None and not isinstance(self._divisions,
+                                                          str):
+            kwargs['divisions'] = [_plain(d) for d in self._divisions]
+        if self._min is not None:
+            kwargs.update(min=_plain(self._min), max=_plain(self._max))
+        if self._buffer_options is not None:
+            kwargs['turbodbc_options'] = self._buffer_options
+        if self._npartitions is not None:
+            kwargs['npartitions'] = self._npartitions
+        kwargs.update(self._trace_state())
+        return dict(args=(self._uri, self._sql_expr), kwargs=kwargs)
+
+    def __setstate__(self, state):
+        self._captured_init_args = state['args']
+        self._captured_init_kwargs = state['kwargs']
+        self.__init__(*state['args'], **state['kwargs'])
 
     def _close(self):
-        if self._connection is not None:
-            self._connection.close()
-        self._connection = None
-        self._cursor = None
+        # connections are only borrowed from the pool for each query
+        self._hook('on_close')
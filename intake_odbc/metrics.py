@@ -0,0 +1,89 @@
+"""Timings and sizes of the queries issued by the ODBC sources"""
+from contextlib import contextmanager
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger('intake_odbc')
+
+
+class QueryMetrics(object):
+    """
+    Record of each query a source has issued
+
+    Every query (the discovery head query, the bounds query, each partition
+    query, ...) produces one dict in ``records``, with keys
+
+    - kind: what the query is for, e.g. ``"head"``, ``"bounds"``,
+      ``"partition"`` or ``"read"``
+    - partition: partition number, or None
+    - sql, sql_hash: the query text, and a short hash of it for grouping
+    - started: wall-clock time at which the query began
+    - duration: seconds from start to end, including conversion to pandas
+    - phases: seconds spent in each of ``connect`` (getting a connection from
+      the pool), ``execute``, ``fetch`` (transfer into Arrow), ``convert``
+      (to pandas) and ``set_index``, where these apply
+    - rows, arrow_bytes, pandas_bytes: size of the result; the pandas size
+      does not include the contents of python string objects
+    - cached: whether the result came from the result cache
+    - spilled: whether the result exceeded ``max_memory`` and was written
+      to a memory-mapped file
+
+    Each finished record is also logged at DEBUG level to the
+    ``"intake_odbc"`` logger, and passed to ``callback``, if given.
+
+    Parameters
+    ----------
+    callback: callable (None)
+        Function called with each finished record
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.records = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def query(self, kind, sql=None, partition=None):
+        """Context for one query, yielding the record to fill in, which is
+        kept once the block ends (also if it raises)"""
+        record = dict(kind=kind, partition=partition, sql=None,
+                      sql_hash=None, started=time.time(), duration=None,
+                      phases={}, rows=None, arrow_bytes=None,
+                      pandas_bytes=None, cached=False, spilled=False)
+        if sql is not None:
+            set_sql(record, sql)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['duration'] = time.perf_counter() - start
+            with self._lock:
+                self.records.append(record)
+            logger.debug('%s query %s: %s rows in %.3fs %s', kind,
+                         record['sql_hash'], record['rows'],
+                         record['duration'], record['phases'])
+            if self.callback is not None:
+                self.callback(record)
+
+    def clear(self):
+        """Forget the records so far"""
+        with self._lock:
+            self.records = []
+
+
+def set_sql(record, sql):
+    record['sql'] = sql
+    record['sql_hash'] = hashlib.sha1(sql.encode()).hexdigest()[:12]
+
+
+@contextmanager
+def timed(record, phase):
+    """Add the time taken by the block to ``phase`` of a query's record"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = record['phases']
+        phases[phase] = phases.get(phase, 0) + time.perf_counter() - start
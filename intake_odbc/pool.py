@@ -0,0 +1,204 @@
+"""Process-wide pool of turbodbc connections, shared by all ODBC sources"""
+import atexit
+from contextlib import contextmanager
+import threading
+import time
+
+from .sizes import _parse_bytes
+
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of idle connections, keyed by connection parameters
+
+    Connections are handed out by ``connection()`` for the duration of one
+    operation and returned afterwards, so that many sources with the same
+    connection parameters share a few connections rather than opening one
+    each.
+
+    ``max_size`` only bounds the connections kept idle. To bound the
+    connections open at once, including those lent out (e.g., to the worker
+    threads of ``max_workers``, ``prefetch`` or ``to_parquet``), set
+    ``max_open``; callers then wait in ``acquire`` for a connection to be
+    returned.
+
+    Parameters
+    ----------
+    max_size: int (8)
+        Most idle connections kept for any one set of connection parameters;
+        surplus connections are closed when returned
+    max_open: int or None (None)
+        Most connections open at once for any one set of connection
+        parameters, idle or lent out; unlimited if None
+    idle_timeout: float (300)
+        Idle connections are closed after this many seconds
+    check_after: float (30)
+        Connections idle for longer than this many seconds are checked with
+        the ``ping`` query before being reused
+    ping: str ("SELECT 1")
+        Query executed to check the health of a connection
+    """
+
+    def __init__(self, max_size=8, idle_timeout=300, check_after=30,
+                 ping='SELECT 1', max_open=None):
+        self.max_size = max_size
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.ping = ping
+        self._idle = {}  # key -> list of (connection, time returned)
+        self._lent = {}  # key -> number of connections lent out
+        self._lock = threading.Lock()
+        self._returned = threading.Condition(self._lock)
+
+    @staticmethod
+    def key(uri, odbc_kwargs):
+        """Hashable identity of a set of connection parameters
+
+        ODBC attribute names are case-insensitive, so keys are lower-cased.
+        """
+        items = []
+        for k, v in odbc_kwargs.items():
+            if isinstance(v, dict):
+                v = sorted(v.items())
+            items.append((k.lower(), repr(v)))
+        return uri, tuple(sorted(items))
+
+    def acquire(self, uri, odbc_kwargs):
+        """Get an idle connection for these parameters, or open a new one
+
+        With ``max_open`` set, waits while that many are lent out.
+        """
+        key = self.key(uri, odbc_kwargs)
+        with self._lock:
+            while (self.max_open is not None and
+                   self._lent.get(key, 0) >= self.max_open):
+                self._returned.wait()
+            self._lent[key] = self._lent.get(key, 0) + 1
+        try:
+            while True:
+                now = time.time()
+                with self._lock:
+                    self._evict(now)
+                    idle = self._idle.get(key)
+                    if not idle:
+                        break
+                    conn, since = idle.pop()
+                if now - since < self.check_after or self._healthy(conn):
+                    return conn
+                _close_quietly(conn)
+            return connect(uri, odbc_kwargs)
+        except BaseException:
+            with self._lock:
+                self._returned_one(key)
+            raise
+
+    def release(self, uri, odbc_kwargs, conn):
+        """Return a connection, which is kept if there is room"""
+        key = self.key(uri, odbc_kwargs)
+        try:
+            # end any transaction implicitly opened by the reads
+            conn.rollback()
+        except Exception:
+            self.discard(uri, odbc_kwargs, conn)
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append((conn, time.time()))
+                self._returned_one(key)
+                return
+        self.discard(uri, odbc_kwargs, conn)
+
+    def discard(self, uri, odbc_kwargs, conn):
+        """Close a lent connection rather than returning it"""
+        _close_quietly(conn)
+        with self._lock:
+            self._returned_one(self.key(uri, odbc_kwargs))
+
+    def _returned_one(self, key):
+        # called with the lock held
+        self._lent[key] -= 1
+        if not self._lent[key]:
+            del self._lent[key]
+        self._returned.notify()
+
+    @contextmanager
+    def connection(self, uri, odbc_kwargs):
+        """Context manager lending a connection for one operation
+
+        If the block raises, the connection may be in an unknown state and
+        is closed rather than returned.
+        """
+        conn = self.acquire(uri, odbc_kwargs)
+        try:
+            yield conn
+        except BaseException:
+            self.discard(uri, odbc_kwargs, conn)
+            raise
+        self.release(uri, odbc_kwargs, conn)
+
+    def clear(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                _close_quietly(conn)
+
+    def _evict(self, now):
+        # called with the lock held
+        for key, conns in list(self._idle.items()):
+            keep = []
+            for conn, since in conns:
+                if now - since > self.idle_timeout:
+                    _close_quietly(conn)
+                else:
+                    keep.append((conn, since))
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+    def _healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.ping)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+
+def connect(uri, odbc_kwargs):
+    """Open a turbodbc connection
+
+    ``turbodbc_options`` may be given as a dict of arguments to
+    ``turbodbc.make_options``, in which case ``read_buffer_size`` may be an
+    integer number of rows or a string size such as ``"20MB"``.
+    """
+    import turbodbc
+    options = odbc_kwargs.get('turbodbc_options')
+    if isinstance(options, dict):
+        options = dict(options)
+        size = options.get('read_buffer_size')
+        if isinstance(size, str):
+            options['read_buffer_size'] = turbodbc.Megabytes(
+                max(1, _parse_bytes(size) // 2**20))
+        elif size is not None:
+            options['read_buffer_size'] = turbodbc.Rows(size)
+        odbc_kwargs = dict(odbc_kwargs,
+                           turbodbc_options=turbodbc.make_options(**options))
+    return turbodbc.connect(connection_string=uri, **odbc_kwargs)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+default_pool = ConnectionPool()
+atexit.register(default_pool.clear)
@@ -0,0 +1,16 @@
+"""Parsing of sizes given as numbers of bytes or strings such as "64MB\""""
+import re
+
+_BYTE_UNITS = {'': 1, 'b': 1, 'kb': 2**10, 'mb': 2**20, 'gb': 2**30,
+               'tb': 2**40, 'kib': 2**10, 'mib': 2**20, 'gib': 2**30,
+               'tib': 2**40}
+
+
+def _parse_bytes(s):
+    """Convert a size such as ``"64MB"`` or ``"1.5 GB"`` into bytes"""
+    if isinstance(s, (int, float)):
+        return int(s)
+    m = re.match(r'^\s*([0-9.]+)\s*([a-zA-Z]*)\s*$', s)
+    if m is None or m.group(2).lower() not in _BYTE_UNITS:
+        raise ValueError('Could not interpret %r as a number of bytes' % s)
+    return int(float(m.group(1)) * _BYTE_UNITS[m.group(2).lower()])
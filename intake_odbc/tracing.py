@@ -0,0 +1,93 @@
+"""Trace spans of the queries run by the ODBC sources, written as JSON"""
+import glob
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+# tracers of one trace in one process share a file, so writes are serialised
+# across all of them
+_lock = threading.Lock()
+
+
+def new_id():
+    return uuid.uuid4().hex[:16]
+
+
+class JSONTracer(object):
+    """
+    Writer of trace spans as lines of JSON, one file per process
+
+    Each source with ``trace_dir`` set has a tracer, which writes a
+    ``"source"`` span when created and one span per query the source runs,
+    the latter children of the former. A pickled source carries its trace id
+    and span id, so that copies unpickled elsewhere (e.g., on dask workers)
+    write spans of the same trace, whose parent is the original source. The
+    files are named by trace id, host and process, so that processes never
+    write to the same file; on a cluster, ``path`` should be on a shared
+    filesystem, or the files collected afterwards. ``read_trace`` loads them.
+
+    Each span is a dict with keys ``trace_id``, ``span_id``, ``parent_id``,
+    ``name``, ``start`` and ``end`` (seconds since the epoch), ``duration``,
+    ``host``, ``pid``, ``thread`` and ``attributes``.
+
+    Parameters
+    ----------
+    path: str
+        Directory in which to write; created if it does not exist
+    trace_id: str (None)
+        Identifier of the trace; a new one is made if not given
+    parent_id: str (None)
+        Span id of the parent of this tracer's source span
+    attributes: dict (None)
+        Attributes of the source span
+    """
+
+    def __init__(self, path, trace_id=None, parent_id=None, attributes=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.parent_id = parent_id
+        self.span_id = new_id()
+        self._host = socket.gethostname()
+        now = time.time()
+        self.export(self.span_id, parent_id, 'source', now, now,
+                    attributes or {})
+
+    def _file(self):
+        # the pid is taken at each write, in case of forking
+        return os.path.join(self.path, '{}-{}-{}.jsonl'.format(
+            self.trace_id, self._host, os.getpid()))
+
+    def export(self, span_id, parent_id, name, start, end, attributes):
+        """Write one span"""
+        span = dict(trace_id=self.trace_id, span_id=span_id,
+                    parent_id=parent_id, name=name, start=start, end=end,
+                    duration=end - start, host=self._host, pid=os.getpid(),
+                    thread=threading.current_thread().name,
+                    attributes=attributes)
+        line = json.dumps(span, default=repr) + '\n'
+        with _lock:
+            with open(self._file(), 'a') as f:
+                f.write(line)
+
+    def export_query(self, record):
+        """Write the span of a finished query, from its metrics record"""
+        attributes = {k: v for k, v in record.items()
+                      if k not in ('kind', 'started', 'duration')}
+        self.export(new_id(), self.span_id, record['kind'],
+                    record['started'], record['started'] + record['duration'],
+                    attributes)
+
+
+def read_trace(path, trace_id=None):
+    """Spans written to directory ``path``, optionally of one trace only,
+    in order of start time"""
+    pattern = '{}-*.jsonl'.format(trace_id) if trace_id else '*.jsonl'
+    spans = []
+    for fn in glob.glob(os.path.join(path, pattern)):
+        with open(fn) as f:
+            spans.extend(json.loads(line) for line in f if line.strip())
+    return sorted(spans, key=lambda span: span['start'])
@@ -0,0 +1,55 @@
+import os
+import time
+
+import pyarrow as pa
+import pytest
+from intake_odbc import ODBCSource
+from intake_odbc.cache import ResultCache
+
+
+def table(n):
+    return pa.table({'x': list(range(n))})
+
+
+def test_roundtrip_and_stats(tmpdir):
+    cache = ResultCache(str(tmpdir))
+    key = cache.key(sql='SELECT 1', uri=None)
+    assert cache.get(key) is None
+    cache.put(key, table(10))
+    assert cache.get(key).equals(table(10))
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_ttl(tmpdir):
+    cache = ResultCache(str(tmpdir), ttl=60)
+    cache.put('old', table(10))
+    fn = os.path.join(str(tmpdir), 'old' + cache.suffix)
+    os.utime(fn, (time.time(), time.time() - 120))
+    assert cache.get('old') is None
+    assert not os.path.exists(fn)
+
+
+def test_lru_eviction(tmpdir):
+    cache = ResultCache(str(tmpdir))
+    cache.put('a', table(1000))
+    size = cache.stats()['size']
+    cache.max_size = int(size * 2.5)
+    cache.put('b', table(1000))
+    now = time.time()
+    os.utime(os.path.join(str(tmpdir), 'b' + cache.suffix), (now - 10, now))
+    cache.get('a')
+    cache.put('c', table(1000))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.evictions == 1
+
+
+def test_options_object_refused(tmpdir):
+    class Options(object):
+        pass
+    with pytest.raises(ValueError):
+        ODBCSource(None, 'SELECT 1', dsn='x', cache_dir=str(tmpdir),
+                   turbodbc_options=Options())
+    ODBCSource(None, 'SELECT 1', dsn='x', cache_dir=str(tmpdir),
+               turbodbc_options={'read_buffer_size': '8MB'})
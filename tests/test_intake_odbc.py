@@ -1,6 +1,10 @@
+import datetime
 import os
+import pickle
 import pandas as pd
+import pytest
 from intake_odbc.intake_odbc import ODBCPartitionedSource, ODBCSource
+from intake_odbc.pool import default_pool
 from .util import mssql, pg, df0
 
 
@@ -35,8 +39,17 @@ def test_mssql_part_minimal(mssql):
     data = s.read()
     assert len(data)
     part1, part2 = s.read_partition(0), s.read_partition(1)
-    assert data.equals(pd.concat([part1, part2], ignore_index=True))
-    assert data.equals(pd.concat(s.read_chunked(), ignore_index=True))
+    assert data.equals(pd.concat([part1, part2]))
+    assert data.equals(pd.concat(s.read_chunked()))
+
+
+def test_mssql_part_parallel(mssql):
+    q = "SELECT * from testtable"
+    args = dict(mssql, index='productid', npartitions=8)
+    serial = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={}, **args)
+    parallel = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                                     max_workers=4, **args)
+    assert parallel.read().equals(serial.read())
 
 
 def test_engines(mssql, pg):
@@ -54,3 +67,288 @@ def test_pg_simple(pg):
     s = ODBCSource(uri=None, sql_expr=q, odbc_kwargs=pg, metadata={})
     out = s.read()
     assert 'datname' in out.columns
+
+
+def test_read_chunked_batch_size(mssql):
+    q = "SELECT * from testtable"
+    s = ODBCSource(uri=None, sql_expr=q, batch_size=1000, metadata={},
+                   **mssql)
+    chunks = list(s.read_chunked())
+    assert [len(c) for c in chunks] == [1000] * 10
+    assert pd.concat(chunks, ignore_index=True).equals(df0.reset_index())
+
+
+def test_quantile_divisions(pg):
+    q = "SELECT * FROM testtable WHERE productid < 100 OR productid > 9000"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=4,
+                              divisions='quantile', **pg)
+    sizes = [len(s.read_partition(i)) for i in range(4)]
+    assert sum(sizes) == 1099
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_divisions_pickled(pg):
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=4, **pg)
+    disc = s.discover()
+    divisions = disc['metadata']['divisions']
+    assert len(divisions) == 5
+    s2 = pickle.loads(pickle.dumps(s))
+    assert list(s2._divisions) == divisions
+    assert s2.read_partition(3).equals(s.read_partition(3))
+
+
+def test_connections_pooled(pg):
+    default_pool.clear()
+    q = "SELECT * FROM testtable"
+    for _ in range(5):
+        ODBCSource(uri=None, sql_expr=q, metadata={}, **pg).discover()
+    idle, = default_pool._idle.values()
+    assert len(idle) == 1
+
+
+def test_discovery_shares_pooled_connections(pg):
+    default_pool.clear()
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, index='productid',
+                              npartitions=2, metadata={}, **pg)
+    s.read()
+    assert s.metadata['turbodbc_options']['read_buffer_size'].endswith('MB')
+    assert len(default_pool._idle) == 1
+
+
+def test_discover_without_rows(pg):
+    q = "SELECT * FROM testtable ORDER BY price"
+    s = ODBCSource(uri=None, sql_expr=q, metadata={}, head_rows=0, **pg)
+    disc = s.discover()
+    assert len(disc['dtype']) == 0
+    assert disc['dtype'].dtypes.equals(s.read().dtypes)
+
+
+def test_columns_projection(mssql):
+    q = "SELECT * from testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=2,
+                              columns=['price'], **mssql)
+    assert list(s.discover()['dtype'].columns) == ['price']
+    data = s.read()
+    assert list(data.columns) == ['price']
+    assert data.index.name == 'productid'
+
+
+def test_read_arrow(pg):
+    q = "SELECT * FROM testtable"
+    s = ODBCSource(uri=None, sql_expr=q, metadata={}, **pg)
+    table = s.read_arrow()
+    assert table.num_rows == len(df0)
+    assert table.to_pandas().equals(s.read())
+    p = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=3, **pg)
+    batches = list(p.to_arrow_batches())
+    assert sum(b.num_rows for b in batches) == len(df0)
+    assert p.read_arrow().num_rows == len(df0)
+
+
+def test_conversion_options(pg):
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=3,
+                              strings='category', self_destruct=True, **pg)
+    assert s.discover()['dtype'].productname.dtype == 'category'
+    data = s.read()
+    assert data.productname.dtype == 'category'
+    assert set(data.productname.cat.categories) == set(df0.productname)
+    s = ODBCSource(uri=None, sql_expr="SELECT productid FROM testtable",
+                   metadata={}, nullable_ints=True, **pg)
+    assert str(s.read().productid.dtype) == 'Int64'
+
+
+def test_timestamp_partitions(pg):
+    q = ("SELECT productid, TIMESTAMP '2020-01-01' + productid * "
+         "INTERVAL '1 hour' AS event_time FROM testtable")
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='event_time', partition_freq='MS', **pg)
+    divisions = s.discover()['metadata']['divisions']
+    assert divisions[0] == datetime.datetime(2020, 1, 1)
+    assert all(d.day == 1 for d in divisions)
+    first = s.read_partition(0)
+    assert len(first) == 31 * 24
+    assert len(s.read()) == len(df0)
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='event_time', npartitions=4, **pg)
+    assert len(s.read()) == len(df0)
+
+
+def test_hash_partitions(mssql):
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productname', npartitions=3,
+                              partitioning='hash', **mssql)
+    assert s.discover()['npartitions'] == 3
+    parts = [s.read_partition(i) for i in range(3)]
+    assert sum(len(p) for p in parts) == len(df0)
+    names = [set(p.index) for p in parts]
+    assert not (names[0] & names[1] or names[1] & names[2])
+
+
+def test_partition_size(pg):
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', rows_per_partition=300, **pg)
+    info = s.discover()
+    assert info['npartitions'] == -(-len(df0) // 300)
+    assert info['shape'][0] == len(df0)
+    assert info['metadata']['row_count'] == len(df0)
+    assert len(s.read()) == len(df0)
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', partition_size='1GB', **pg)
+    assert s.discover()['npartitions'] == 1
+
+
+def test_dask_divisions(pg):
+    pytest.importorskip('dask.dataframe')
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=4,
+                              sort_index=True, **pg)
+    ddf = s.to_dask()
+    assert ddf.known_divisions
+    assert list(ddf.divisions) == s.discover()['metadata']['divisions']
+    part = ddf.loc[100:120].compute()
+    assert list(part.index) == list(range(100, 121))
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=4,
+                              partitioning='hash', **pg)
+    assert not s.to_dask().known_divisions
+
+
+def test_prefetch(pg):
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=5, prefetch=2,
+                              **pg)
+    chunks = list(s.read_chunked())
+    assert len(chunks) == 5
+    out = pd.concat(chunks)
+    assert out.index.tolist() == sorted(out.index)
+    assert len(out) == len(df0)
+    it = s.read_chunked()
+    next(it)
+    it.close()  # stopping early cancels the queued queries
+
+
+def test_bound_parameters(pg):
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=3,
+                              filters=[('price', '>', 1)], **pg)
+    s.discover()
+    conds = [s._partition_condition(i) for i in range(3)]
+    assert len({c for c, _ in conds}) == 1
+    assert [p for _, p in conds] == [list(s._divisions[i:i+2])
+                                     for i in range(3)]
+    assert len(s.read()) == (df0.price > 1).sum()
+
+
+def test_incremental(pg, tmpdir):
+    import turbodbc
+    conn = turbodbc.connect(**pg)
+    curs = conn.cursor()
+    curs.execute("CREATE TABLE growing AS SELECT * FROM testtable "
+                 "WHERE productid < 5000")
+    conn.commit()
+    kwargs = dict(pg, index='productid', npartitions=2, incremental=True,
+                  cache_dir=str(tmpdir))
+    q = "SELECT * FROM growing"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={}, **kwargs)
+    assert len(s.read()) == 5000
+    curs.execute("INSERT INTO growing SELECT * FROM testtable "
+                 "WHERE productid >= 5000")
+    conn.commit()
+    conn.close()
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={}, **kwargs)
+    out = s.read()
+    assert len(out) == len(df0)
+    assert out.index.max() == df0.index.max()
+    stats = s.result_cache.stats()
+    assert (stats['hits'], stats['entries']) == (1, 1)
+
+
+def test_query_metrics(pg):
+    seen = []
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=2,
+                              metrics_callback=seen.append, **pg)
+    s.read()
+    kinds = [r['kind'] for r in s.metrics.records]
+    assert kinds[:2] == ['head', 'bounds']
+    parts = [r for r in s.metrics.records if r['kind'] == 'partition']
+    assert sorted(r['partition'] for r in parts) == [0, 1]
+    assert sum(r['rows'] for r in parts) == len(df0)
+    assert len({r['sql_hash'] for r in parts}) == 1
+    assert all(r['arrow_bytes'] and r['pandas_bytes'] for r in parts)
+    assert {'connect', 'execute', 'fetch', 'convert',
+            'set_index'} <= set(parts[0]['phases'])
+    assert seen == s.metrics.records
+
+
+def test_hooks(pg):
+    from intake_odbc.hooks import QueryHooks
+
+    class Recorder(QueryHooks):
+        def __init__(self):
+            self.calls = []
+
+        def on_execute_start(self, source, record):
+            self.calls.append(('execute', record['kind']))
+
+        def on_convert_complete(self, source, record, df):
+            self.calls.append(('convert', record['partition'], len(df)))
+
+        def on_close(self, source):
+            self.calls.append(('close',))
+
+    hooks = Recorder()
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=2, hooks=hooks,
+                              **pg)
+    s.read()
+    s.close()
+    assert hooks.calls[:2] == [('execute', 'head'), ('execute', 'bounds')]
+    converted = [c for c in hooks.calls if c[0] == 'convert']
+    assert sum(c[2] for c in converted) == len(df0)
+    assert hooks.calls[-1] == ('close',)
+
+
+def test_to_parquet(pg, tmpdir):
+    import pyarrow.parquet as pq
+    q = "SELECT * FROM testtable"
+    s = ODBCSource(uri=None, sql_expr=q, metadata={}, **pg)
+    fn = s.to_parquet(str(tmpdir.join('all.parquet')), row_group_size=3000)
+    meta = pq.ParquetFile(fn).metadata
+    assert (meta.num_rows, meta.num_row_groups) == (len(df0), 4)
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=3, **pg)
+    files = s.to_parquet(str(tmpdir.join('parts')), max_workers=3)
+    assert len(files) == 3
+    out = pq.read_table(str(tmpdir.join('parts'))).to_pandas()
+    assert sorted(out.productid) == list(df0.index)
+
+
+def test_dask_projection(pg):
+    pytest.importorskip('dask.dataframe')
+    import dask
+    q = "SELECT * FROM testtable"
+    s = ODBCPartitionedSource(uri=None, sql_expr=q, metadata={},
+                              index='productid', npartitions=2, **pg)
+    with dask.config.set(scheduler='sync'):
+        out = s.to_dask()[['price']].compute()
+    assert out.columns.tolist() == ['price']
+    assert len(out) == len(df0)
+    sql = [r['sql'] for r in s.metrics.records if r['kind'] == 'partition']
+    assert sql and not any('productdescription' in q or 'sq.*' in q
+                           for q in sql)
@@ -0,0 +1,27 @@
+import pytest
+from intake_odbc.metrics import QueryMetrics, timed
+
+
+def test_records_and_callback():
+    seen = []
+    metrics = QueryMetrics(callback=seen.append)
+    with metrics.query('bounds', 'SELECT 1', partition=2) as record:
+        with timed(record, 'execute'):
+            pass
+        record['rows'] = 1
+    assert seen == metrics.records
+    record, = metrics.records
+    assert record['kind'] == 'bounds' and record['partition'] == 2
+    assert record['sql'] == 'SELECT 1' and len(record['sql_hash']) == 12
+    assert set(record['phases']) == {'execute'}
+    assert record['duration'] >= record['phases']['execute']
+    metrics.clear()
+    assert metrics.records == []
+
+
+def test_failed_query_recorded():
+    metrics = QueryMetrics()
+    with pytest.raises(ValueError):
+        with metrics.query('partition'):
+            raise ValueError
+    assert metrics.records[0]['rows'] is None
@@ -0,0 +1,42 @@
+import threading
+import time
+
+from intake_odbc import pool
+from intake_odbc.pool import ConnectionPool
+
+
+class Connection(object):
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_max_open(monkeypatch):
+    monkeypatch.setattr(pool, 'connect', lambda uri, kw: Connection())
+    p = ConnectionPool(max_open=2)
+    lent = [p.acquire('db', {}), p.acquire('db', {})]
+    got = []
+    t = threading.Thread(target=lambda: got.append(p.acquire('db', {})))
+    t.start()
+    time.sleep(0.1)
+    assert not got
+    p.release('db', {}, lent[0])
+    t.join(5)
+    assert got == [lent[0]]
+    # a different key has its own limit
+    p.acquire('other', {})
+
+
+def test_failed_connect_not_counted(monkeypatch):
+    def fail(uri, kw):
+        raise RuntimeError
+    monkeypatch.setattr(pool, 'connect', fail)
+    p = ConnectionPool(max_open=1)
+    for _ in range(2):
+        try:
+            p.acquire('db', {})
+        except RuntimeError:
+            pass
+    assert not p._lent
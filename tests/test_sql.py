@@ -0,0 +1,110 @@
+import pytest
+from intake_odbc.intake_odbc import (compile_filters, filtered, head,
+                                     select_list)
+
+
+def test_compile_filters():
+    where, params = compile_filters([('price', '>', 5),
+                                     ('productname', 'in', ['a', 'b'])])
+    assert where == '(sq.price > ? AND sq.productname IN (?, ?))'
+    assert params == [5, 'a', 'b']
+    where, params = compile_filters([[['price', '<', 1]],
+                                     [('productid', '==', 3)]])
+    assert where == '(sq.price < ?) OR (sq.productid = ?)'
+    assert params == [1, 3]
+    assert compile_filters(None) == (None, [])
+
+
+@pytest.mark.parametrize('bad', [[('a b', '=', 1)], [('a', 'like', 1)]])
+def test_compile_filters_invalid(bad):
+    with pytest.raises(ValueError):
+        compile_filters(bad)
+
+
+@pytest.mark.parametrize('bad', ['a b', 'x; DROP TABLE t', 1])
+def test_select_list_invalid(bad):
+    with pytest.raises(ValueError):
+        select_list(['x', bad])
+
+
+def test_filtered_head():
+    q = filtered('SELECT * FROM t', 'sq.x = ?')
+    assert q == 'SELECT sq.* FROM (SELECT * FROM t) sq WHERE sq.x = ?'
+    assert head(q, 5, columns=['x']) == \
+        'SELECT sq.x FROM ({}) sq LIMIT 5'.format(q)
+    assert head(q, 5, mssql=True) == 'SELECT TOP 5 sq.* FROM ({}) sq'.format(q)
+
+
+def test_buffer_options():
+    import pyarrow as pa
+    from intake_odbc.intake_odbc import buffer_options
+    narrow = pa.table({'a': [1, 2], 'b': [1.0, 2.0]})
+    # BUFFER_ROWS[1] rows of 16 bytes
+    assert buffer_options(narrow) == {'read_buffer_size': '16MB'}
+    medium = pa.table({'a': [1, 2], 'b': ['x' * 40, None]})
+    assert buffer_options(medium) == {'read_buffer_size': '32MB'}
+    wide = pa.table({'a': [1, 2], 'b': ['x' * 1000, None],
+                     'c': ['12345678901234567890.5', '1']})
+    opts = buffer_options(wide, mssql=True)
+    assert opts['read_buffer_size'].endswith('MB')
+    assert opts['prefer_unicode']
+    # lossy for decimals, so only set when asked for
+    assert 'large_decimals_as_64_bit_types' not in opts
+
+
+def test_temporal_bounds():
+    import datetime
+    import numpy as np
+    from intake_odbc.intake_odbc import after, calendar_divisions, sql_param
+    ts = datetime.datetime
+    assert after(ts(2020, 1, 1, 5, 3, 2, 500)) == ts(2020, 1, 1, 5, 3, 3)
+    assert after(datetime.date(2020, 1, 1)) == datetime.date(2020, 1, 2)
+    assert after(3) == 4
+    assert calendar_divisions(ts(2020, 1, 15), ts(2020, 3, 2), 'MS') == [
+        ts(2020, 1, 1), ts(2020, 2, 1), ts(2020, 3, 1), ts(2020, 4, 1)]
+    assert type(sql_param(np.datetime64('2020-01-01'))) is ts
+    assert type(sql_param(np.float64(1.5))) is float
+    assert sql_param(datetime.date(2020, 1, 1)) == datetime.date(2020, 1, 1)
+
+
+def test_hash_condition():
+    from intake_odbc.intake_odbc import hash_condition, MSSQL_HASH
+    assert hash_condition('sq.k', 8, 3, MSSQL_HASH) == \
+        'ABS((CHECKSUM(sq.k)) % 8) = 3'
+    assert hash_condition('sq.k', 2, 0) == \
+        'ABS((hashtext(CAST(sq.k AS TEXT))) % 2) = 0'
+
+
+def test_estimate_row_width():
+    import pyarrow as pa
+    from intake_odbc.intake_odbc import estimate_row_width
+    table = pa.table({'a': [1, 2], 'b': ['x' * 100, 'y' * 100]})
+    assert estimate_row_width(table) >= 100
+    assert estimate_row_width(table.slice(0, 0)) > 0
+
+
+def test_collect_spilling(tmpdir):
+    import os
+    import pyarrow as pa
+    from intake_odbc.intake_odbc import collect_spilling
+    parts = [pa.table({'x': list(range(i, i + 100)),
+                       's': pa.array(['a', 'b'] * 50).dictionary_encode()})
+             for i in range(0, 1000, 100)]
+    whole = pa.concat_tables(parts)
+    table, spilled = collect_spilling(iter(parts), 10**9, str(tmpdir))
+    assert not spilled and table.equals(whole)
+    table, spilled = collect_spilling(iter(parts), 1000, str(tmpdir))
+    assert spilled
+    assert table.column('x').to_pylist() == whole.column('x').to_pylist()
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_write_parquet(tmpdir):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from intake_odbc.intake_odbc import write_parquet
+    parts = [pa.table({'x': list(range(i, i + 10))}) for i in (0, 10, 20)]
+    fn = str(tmpdir.join('out.parquet'))
+    write_parquet(iter(parts), fn, compression='zstd')
+    assert pq.ParquetFile(fn).metadata.num_row_groups == 3
+    assert pq.read_table(fn).column('x').to_pylist() == list(range(30))
@@ -0,0 +1,30 @@
+import pickle
+import time
+
+from intake_odbc.intake_odbc import ODBCPartitionedSource
+from intake_odbc.tracing import JSONTracer, read_trace
+
+
+def test_spans_written(tmpdir):
+    tracer = JSONTracer(str(tmpdir), attributes={'a': 1})
+    start = time.time() + 1
+    tracer.export_query(dict(kind='partition', partition=3, started=start,
+                             duration=2.0, rows=5))
+    source, query = read_trace(str(tmpdir), tracer.trace_id)
+    assert source['name'] == 'source' and source['attributes'] == {'a': 1}
+    assert source['parent_id'] is None
+    assert query['name'] == 'partition' and query['end'] == start + 2
+    assert query['parent_id'] == source['span_id']
+    assert query['attributes'] == {'partition': 3, 'rows': 5}
+    assert read_trace(str(tmpdir), 'other') == []
+
+
+def test_trace_follows_pickle(tmpdir):
+    s = ODBCPartitionedSource(uri=None, sql_expr='SELECT 1', metadata={},
+                              index='x', npartitions=2, dsn='x',
+                              trace_dir=str(tmpdir))
+    s2 = pickle.loads(pickle.dumps(s))
+    assert s2.tracer.trace_id == s.tracer.trace_id
+    assert s2.tracer.parent_id == s.tracer.span_id
+    spans = read_trace(str(tmpdir))
+    assert [sp['name'] for sp in spans] == ['source', 'source']